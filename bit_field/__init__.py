@@ -1,4 +1,25 @@
-from .render import render
+from ._version import __version__
+from .render import (
+    render, render_svg, render_key, iter_svg, render_to, compile_layout, marker_defs, LayoutPlan,
+)
 from .jsonml_stringify import jsonml_stringify
+from .cache import RenderCache, DiskCache
+from .batch import render_many, iter_render_many, render_pages, RenderResult
+from .register import Register
 
-__all__ = ['render', 'jsonml_stringify']
+__all__ = [
+    '__version__',
+    'render', 'render_svg', 'render_key', 'iter_svg', 'render_to', 'compile_layout', 'marker_defs', 'LayoutPlan',
+    'jsonml_stringify', 'RenderCache', 'DiskCache', 'render_many', 'iter_render_many', 'render_pages',
+    'RenderResult', 'Register',
+    'render_async', 'iter_render_many_async',
+]
+
+
+def __getattr__(name):
+    # the async API is loaded on first use, so asyncio is only imported by
+    # applications that need it
+    if name in ('render_async', 'iter_render_many_async'):
+        from . import aio
+        return getattr(aio, name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -0,0 +1 @@
+__version__ = '1.2.0'
@@ -0,0 +1,134 @@
+"""asyncio front end: render on an executor without blocking the event loop."""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .batch import RenderResult, _describe, split_document
+from .jsonml_stringify import jsonml_stringify
+from .render import Renderer, _render_key, _renderer_for, render_svg
+
+
+def _render_until(renderer, desc, indent, cancelled):
+    # runs on an executor thread; gives up between lanes once cancelled
+    context = renderer._context()
+    plan, res, content_group = context._begin(desc)
+    for child in context._content(plan):
+        if cancelled.is_set():
+            return None
+        content_group.append(child)
+    res.append(content_group)
+    return jsonml_stringify(res, indent)
+
+
+async def _run(executor, renderer, desc, options, indent):
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        # the cancel flag can't reach another process: cancelling only
+        # drops work that has not started yet
+        return await loop.run_in_executor(
+            executor, partial(render_svg, desc, indent=indent, **options))
+    cancelled = threading.Event()
+    try:
+        return await loop.run_in_executor(
+            executor, _render_until, renderer, desc, indent, cancelled)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+async def render_async(desc, executor=None, semaphore=None, cache=None, indent=None, **options):
+    """Render ``desc`` on ``executor`` and return the serialized SVG document.
+
+    ``executor`` defaults to the event loop's default thread pool; a
+    :class:`~concurrent.futures.ProcessPoolExecutor` renders in parallel.
+    Pass one ``asyncio.Semaphore`` to all calls to bound how many renders
+    run at once. When the awaiting task is cancelled, a render on a thread
+    stops before drawing its next lane. ``cache`` and ``indent`` work as in
+    :func:`~bit_field.render_svg`. Invalid options raise immediately.
+    """
+    renderer = _renderer_for(desc, options)
+    key = None
+    if cache is not None:
+        key = _render_key(desc, renderer, indent)
+        svg = cache.get(key)
+        if svg is not None:
+            return svg
+    if semaphore is None:
+        svg = await _run(executor, renderer, desc, options, indent)
+    else:
+        async with semaphore:
+            svg = await _run(executor, renderer, desc, options, indent)
+    if key is not None:
+        cache.put(key, svg)
+    return svg
+
+
+async def _render_item(index, desc, executor, options):
+    start = time.perf_counter()
+    try:
+        desc, overrides = split_document(desc)
+        svg = await render_async(desc, executor=executor, **dict(options, **overrides))
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        return RenderResult(index, None, _describe(exc), time.perf_counter() - start)
+    return RenderResult(index, svg, None, time.perf_counter() - start)
+
+
+async def _aiter(descs):
+    if hasattr(descs, '__aiter__'):
+        async for desc in descs:
+            yield desc
+    else:
+        for desc in descs:
+            yield desc
+
+
+async def iter_render_many_async(descs, executor=None, limit=None, ordered=True, **options):
+    """Render many descriptors, yielding a :class:`~bit_field.RenderResult` each.
+
+    The async counterpart of :func:`~bit_field.iter_render_many`. ``descs``
+    may be an iterable or an async iterable. At most ``limit`` descriptors
+    (default: one per CPU) are rendering or waiting to be consumed at any
+    time, so a slow consumer stops the input from being read ahead. With
+    ``ordered=False`` results are yielded as soon as they are ready. Closing
+    the iterator early cancels the renders still in flight.
+    """
+    if limit is None:
+        limit = os.cpu_count() or 1
+    if limit <= 0:
+        raise ValueError('limit must be greater than 0, got {}.'.format(limit))
+    # bad options would fail every item; report them once, up front
+    Renderer(**{k: v for k, v in options.items() if k not in ('cache', 'indent')})
+    items = _aiter(descs)
+    pending = []
+    index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    desc = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.append(asyncio.ensure_future(_render_item(index, desc, executor, options)))
+                index += 1
+            if not pending:
+                return
+            if ordered:
+                task = pending.pop(0)
+                yield await task
+                continue
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending[:]:
+                if task in done:
+                    pending.remove(task)
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        await items.aclose()
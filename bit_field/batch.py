@@ -0,0 +1,197 @@
+import os
+import time
+from collections import deque, namedtuple
+
+from .render import Renderer, render_key, render_svg
+
+RenderResult = namedtuple('RenderResult', ['index', 'svg', 'error', 'seconds'])
+RenderResult.__doc__ = """Outcome of one descriptor in a batch.
+
+``svg`` is the rendered document, or ``None`` when rendering failed, in
+which case ``error`` holds the exception type and message. ``seconds`` is
+the time spent rendering it.
+"""
+
+
+def split_document(data):
+    """Split an input document into ``(descriptor, options)``.
+
+    Documents of the form ``{"config": {...}, "payload": [...]}`` carry their
+    own renderer options; a bare descriptor list has none.
+    """
+    if isinstance(data, dict) and 'payload' in data:
+        return data['payload'], dict(data.get('config') or {})
+    return data, {}
+
+
+def config_options(data):
+    """Return the renderer options of a shared config document.
+
+    Accepts ``{"config": {...}}`` documents as well as a plain mapping of
+    options.
+    """
+    if not isinstance(data, dict):
+        raise TypeError('config document must be a mapping')
+    return dict(data['config'] or {}) if 'config' in data else dict(data)
+
+
+def _describe(exc):
+    return '{}: {}'.format(type(exc).__name__, exc)
+
+
+def _render_chunk(chunk, options):
+    # runs in the worker: only descriptors go in and SVG strings come out
+    results = []
+    for index, desc in chunk:
+        start = time.perf_counter()
+        try:
+            desc, overrides = split_document(desc)
+            svg = render_svg(desc, **dict(options, **overrides))
+        except Exception as exc:
+            results.append((index, None, _describe(exc), time.perf_counter() - start))
+        else:
+            results.append((index, svg, None, time.perf_counter() - start))
+    return results
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_unordered(items, jobs, chunksize, options):
+    chunks = _chunks(items, chunksize)
+    if jobs <= 1:
+        for chunk in chunks:
+            for result in _render_chunk(chunk, options):
+                yield RenderResult(*result)
+        return
+
+    # multiprocessing is slow to import; only pay for it when fanning out
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = {}
+
+        def submit():
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            pending[pool.submit(_render_chunk, chunk, options)] = chunk
+            return True
+
+        # keep a bounded number of chunks in flight so huge inputs are
+        # never materialized all at once
+        while len(pending) < jobs * 2 and submit():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as exc:
+                    results = [(index, None, _describe(exc), 0.0) for index, _ in chunk]
+                for result in results:
+                    yield RenderResult(*result)
+                submit()
+
+
+def _iter_cached(descs, jobs, chunksize, options, cache):
+    # cache lookups stay in this process; only misses go to the workers
+    keys = {}
+    hits = deque()
+
+    def misses():
+        for index, desc in enumerate(descs):
+            start = time.perf_counter()
+            key = None
+            try:
+                payload, overrides = split_document(desc)
+                key = render_key(payload, **dict(options, **overrides))
+            except Exception:
+                # leave the error to be reported by the renderer
+                pass
+            else:
+                svg = cache.get(key)
+                if svg is not None:
+                    hits.append(RenderResult(index, svg, None, time.perf_counter() - start))
+                    continue
+            keys[index] = key
+            yield index, desc
+
+    for result in _iter_unordered(misses(), jobs, chunksize, options):
+        while hits:
+            yield hits.popleft()
+        key = keys.pop(result.index)
+        if key is not None and result.error is None:
+            cache.put(key, result.svg)
+        yield result
+    while hits:
+        yield hits.popleft()
+
+
+def iter_render_many(descs, jobs=None, chunksize=16, ordered=True, **options):
+    """Render many descriptors, yielding a :class:`RenderResult` per input.
+
+    Work is split into chunks of ``chunksize`` descriptors and fanned out to
+    ``jobs`` worker processes (default: one per CPU; ``jobs=1`` renders in
+    this process). With ``ordered=False`` results are yielded as soon as
+    their chunk completes. A descriptor that fails to render yields a result
+    with ``error`` set instead of aborting the batch. Items may also be
+    ``{"config": ..., "payload": ...}`` documents whose config overrides
+    ``options`` for that item. A ``cache`` is consulted and filled in this
+    process; only the descriptors it misses are sent to the workers.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if chunksize <= 0:
+        raise ValueError('chunksize must be greater than 0, got {}.'.format(chunksize))
+    # bad options would fail every item; report them once, up front
+    Renderer(**{k: v for k, v in options.items() if k not in ('cache', 'indent')})
+    cache = options.pop('cache', None)
+    if cache is None:
+        results = _iter_unordered(enumerate(descs), jobs, chunksize, options)
+    else:
+        results = _iter_cached(descs, jobs, chunksize, options, cache)
+    if not ordered:
+        yield from results
+        return
+    waiting = {}
+    next_index = 0
+    for result in results:
+        waiting[result.index] = result
+        while next_index in waiting:
+            yield waiting.pop(next_index)
+            next_index += 1
+
+
+def render_many(descs, jobs=None, chunksize=16, **options):
+    """Render many descriptors in parallel and return their results in input
+    order as a list of :class:`RenderResult`."""
+    return list(iter_render_many(descs, jobs=jobs, chunksize=chunksize, **options))
+
+
+def render_pages(desc, max_height, jobs=None, **options):
+    """Render a tall diagram as pages no taller than ``max_height``.
+
+    The lanes are split into windows with :meth:`Renderer.page_ranges` and
+    each window is rendered in parallel with the ``lane_range`` option, so
+    every page keeps the bit numbering of the full register. Returns the
+    SVG documents from top to bottom.
+    """
+    options.pop('lane_range', None)
+    renderer = Renderer(**{k: v for k, v in options.items() if k not in ('cache', 'indent')})
+    pages = [{'config': {'lane_range': list(lane_range)}, 'payload': desc}
+             for lane_range in renderer.page_ranges(desc, max_height)]
+    svgs = []
+    for result in iter_render_many(pages, jobs=jobs, chunksize=1, **options):
+        if result.error is not None:
+            raise ValueError('page {} failed: {}'.format(result.index, result.error))
+        svgs.append(result.svg)
+    return svgs
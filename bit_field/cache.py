@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Set
+from contextlib import contextmanager
+
+from ._version import __version__
+from .fsutil import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+def _canonical(value):
+    if isinstance(value, Mapping):
+        return {str(k): v for k, v in value.items()}
+    if isinstance(value, Set):
+        return sorted(value, key=repr)
+    if isinstance(value, tuple):
+        return list(value)
+    return repr(value)
+
+
+def _tag_tuples(value):
+    # json.dumps writes tuples as lists without consulting ``default``; tag
+    # them, since the renderer draws ('RO', 'RW') and ['RO', 'RW'] differently
+    if isinstance(value, tuple):
+        return {'__tuple__': [_tag_tuples(v) for v in value]}
+    if isinstance(value, list):
+        return [_tag_tuples(v) for v in value]
+    if isinstance(value, Mapping):
+        return {str(k): _tag_tuples(v) for k, v in value.items()}
+    if isinstance(value, Set):
+        return sorted((_tag_tuples(v) for v in value), key=repr)
+    return value
+
+
+def cache_key(desc, options):
+    """Return a content hash of a descriptor and the full renderer options.
+
+    ``options`` should be the complete option mapping of a renderer
+    (``Renderer.options``) so that explicitly passed defaults hash the same as
+    omitted ones.
+    """
+    payload = json.dumps(_tag_tuples([desc, options]), sort_keys=True, separators=(',', ':'),
+                         default=_canonical)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache(object):
+    """Bounded in-process LRU cache of serialized SVG documents.
+
+    Pass an instance as ``cache=`` to :func:`bit_field.render_svg`. Lookups are
+    keyed by :func:`cache_key`, so an unchanged descriptor rendered with the
+    same options is served without rendering. The cache is thread-safe.
+    """
+
+    def __init__(self, maxsize=256):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be greater than 0, got {}.'.format(maxsize))
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            svg = self._entries.get(key)
+            if svg is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return svg
+
+    def put(self, key, svg):
+        with self._lock:
+            self._entries[key] = svg
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached documents and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class DiskCache(object):
+    """Persistent SVG cache in a directory shared between processes and runs.
+
+    Entries are addressed by :func:`cache_key` combined with the library
+    version, so upgrading bit_field never serves stale drawings. Files are
+    written atomically; eviction holds an exclusive lock on the directory so
+    parallel workers can share one cache. When the total size exceeds
+    ``max_size`` bytes the least recently used entries are removed. Instances
+    are picklable and can be passed to worker processes.
+    """
+
+    SUFFIX = '.svg'
+
+    def __init__(self, directory, max_size=512 * 1024 * 1024):
+        if max_size <= 0:
+            raise ValueError('max_size must be greater than 0, got {}.'.format(max_size))
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # bytes written since the last size check
+        self._written = 0
+
+    def _path(self, key):
+        digest = hashlib.sha256('{}:{}'.format(__version__, key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + self.SUFFIX)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _entries(self):
+        try:
+            shards = os.scandir(self.directory)
+        except FileNotFoundError:
+            return
+        with shards:
+            for shard in shards:
+                if not shard.is_dir() or len(shard.name) != 2:
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(self.SUFFIX):
+                            try:
+                                stat = entry.stat()
+                            except FileNotFoundError:
+                                continue
+                            yield entry.path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                svg = f.read().decode('utf-8')
+            # the modification time records the last use for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return svg
+
+    def put(self, key, svg):
+        data = svg.encode('utf-8')
+        atomic_write(self._path(key), data)
+        self._written += len(data)
+        if self._written * 16 >= self.max_size:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_size``."""
+        self._written = 0
+        with self._locked():
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if total <= self.max_size:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        """Remove all cached documents and reset the hit/miss counters."""
+        with self._locked():
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        self._written = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(1 for _ in self._entries())
+
+    def size(self):
+        """Total size of the cached documents in bytes."""
+        return sum(size for _, _, size in self._entries())
+
+    def stats(self):
+        """Return hit/miss counters of this instance and the on-disk totals."""
+        entries = list(self._entries())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'size': sum(size for _, _, size in entries),
+            'max_size': self.max_size,
+        }
@@ -1,20 +1,19 @@
-from .render import render
-from .jsonml_stringify import jsonml_stringify
+from .render import render_key, render_svg
+from .cache import DiskCache
+from pathlib import Path
 import argparse
+import glob
+import os
+import sys
+import time
 
 
-def beautify(res):
-    import xml.dom.minidom
-    xml = xml.dom.minidom.parseString(res)
-    res = xml.toprettyxml()
-    return res
-
-
-def bit_field_cli():
+def build_parser():
     parser = argparse.ArgumentParser('bitfield')
 
     parser.add_argument(
-        'input', help='input JSON filename - must be specified always')
+        'input', nargs='*',
+        help='input JSON filenames, directories or glob patterns - must be specified always')
     parser.add_argument(
         '--input', help='(compatibility option)', action='store_true')
     parser.add_argument('--vspace', help='vertical space', default=80, type=int)
@@ -25,7 +24,8 @@ def bit_field_cli():
     parser.add_argument('--fontweight', default='normal')
     parser.add_argument('--fontsize', default=14, type=int)
     parser.add_argument('--strokewidth', help='stroke width', default=1, type=float)
-    parser.add_argument('--beautify', action='store_true')
+    parser.add_argument('--beautify', help='pretty-print the SVG', action='store_true')
+    parser.add_argument('--indent', help='indentation width for --beautify', default=2, type=int)
     parser.add_argument('--json5', action='store_true')
     parser.add_argument('--no-json5', action='store_true')
     parser.add_argument('--compact', action='store_true')
@@ -40,8 +40,36 @@ def bit_field_cli():
     parser.add_argument('--label-end-line', type=int)
     parser.add_argument('--label-layout', choices=['left', 'right'], default='left')
     parser.add_argument('--label-angle', type=float)
-    args = parser.parse_args()
+    parser.add_argument('--css-classes', help='style text and type colours with a CSS style sheet',
+                        action='store_true')
+    parser.add_argument('--coalesce-paths', help='draw each lane frame and its ticks as one path',
+                        action='store_true')
+    parser.add_argument('--precision', help='round coordinates to this many decimals', type=int)
+    parser.add_argument('--fold-lanes', help='fold runs of identical lanes into one marker row',
+                        action='store_true')
+    parser.add_argument('--use-symbols', help='draw repeated lanes once as <symbol> and <use> them',
+                        action='store_true')
+    parser.add_argument('--cage-cache', help='reuse lane frames across the diagrams of one run',
+                        action='store_true')
+    parser.add_argument('--lane-range', help='only draw rows FIRST to LAST', nargs=2, type=int,
+                        metavar=('FIRST', 'LAST'))
+    parser.add_argument('--output-dir', help='write one SVG per input into this directory')
+    parser.add_argument('--jobs', help='number of rendering processes', default=1, type=int)
+    parser.add_argument('--config', help='shared config document applied to every input')
+    parser.add_argument('--watch', metavar='DIR', help='re-render changed files below DIR until interrupted')
+    parser.add_argument('--interval', help='watch polling interval in seconds', default=0.5, type=float)
+    parser.add_argument('--cache-dir', default=os.environ.get('BITFIELD_CACHE_DIR'),
+                        help='persistent render cache directory (default: $BITFIELD_CACHE_DIR)')
+    parser.add_argument('--cache-size', help='render cache size limit in MiB', default=512, type=int)
+    parser.add_argument('--cache-stats', help='report render cache usage on stderr', action='store_true')
+    # const '' stands for the default address, so --help needn't import the server
+    parser.add_argument('--server', nargs='?', const='', metavar='URL',
+                        help='render on a running "bit_field serve" (its default address without URL), '
+                             'falling back to rendering in-process')
+    return parser
 
+
+def json_module(args):
     # default is json5, unless forced with --(no-)json5
     if args.json5:
         import json5 as json
@@ -52,38 +80,233 @@ def bit_field_cli():
             import json5 as json
         except ModuleNotFoundError:
             import json
+    return json
+
+
+def render_options(args):
+    label_cfg = None
+    if args.label_lines is not None:
+        label_cfg = {
+            'label_lines': args.label_lines,
+            'font_size': args.label_fontsize if args.label_fontsize is not None else args.fontsize,
+            'start_line': args.label_start_line,
+            'end_line': args.label_end_line,
+            'layout': args.label_layout,
+        }
+        if args.label_angle is not None:
+            label_cfg['angle'] = args.label_angle
+    return dict(hspace=args.hspace,
+                vspace=args.vspace,
+                lanes=args.lanes,
+                bits=args.bits,
+                fontfamily=args.fontfamily,
+                fontweight=args.fontweight,
+                fontsize=args.fontsize,
+                compact=args.compact,
+                hflip=args.hflip,
+                vflip=args.vflip,
+                strokewidth=args.strokewidth,
+                trim=args.trim,
+                uneven=args.uneven,
+                legend={key: value for key, value in args.legend} if args.legend else None,
+                label_lines=label_cfg,
+                css_classes=args.css_classes,
+                coalesce_paths=args.coalesce_paths,
+                precision=args.precision,
+                fold_lanes=args.fold_lanes,
+                use_symbols=args.use_symbols,
+                cage_cache=args.cage_cache,
+                lane_range=tuple(args.lane_range) if args.lane_range else None,
+                indent=args.indent if args.beautify else None)
+
+
+def expand_inputs(patterns):
+    """Resolve input arguments to ``(path, output_name)`` pairs.
+
+    Directories contribute every JSON/JSON5 file below them (output names keep
+    the relative path), arguments that are not existing files are treated as
+    glob patterns.
+    """
+    from .watch import INPUT_SUFFIXES
+    inputs = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            for child in sorted(path.rglob('*')):
+                if child.suffix in INPUT_SUFFIXES and child.is_file():
+                    inputs.append((child, child.relative_to(path).with_suffix('.svg')))
+        elif path.exists() or not glob.has_magic(pattern):
+            inputs.append((path, Path(path.name).with_suffix('.svg')))
+        else:
+            for match in sorted(glob.glob(pattern, recursive=True)):
+                match = Path(match)
+                if match.is_file():
+                    inputs.append((match, Path(match.name).with_suffix('.svg')))
+    return inputs
+
+
+def output_collisions(inputs):
+    """Return ``{output_name: [paths]}`` for output names used by several inputs."""
+    paths = {}
+    for path, name in inputs:
+        paths.setdefault(name, []).append(path)
+    return {name: found for name, found in paths.items() if len(found) > 1}
+
+
+def render_files(inputs, json, options, output_dir=None, jobs=1, log=None, cache=None):
+    """Render ``inputs`` (as returned by :func:`expand_inputs`) to SVG files.
+
+    Each SVG is written to ``output_dir`` under its output name, or next to
+    its input file when no output directory is given. Documents found in
+    ``cache`` are copied without rendering and new renderings are added to
+    it. A summary of timings and failures is written to ``log``. Returns the
+    number of failures.
+    """
+    from .batch import iter_render_many, split_document
+    log = log or sys.stderr
+    start = time.perf_counter()
+    documents = []
+    targets = []
+    keys = []
+    failures = []
+    written = 0
+    for path, name in inputs:
+        try:
+            with open(path, 'r') as f:
+                document = json.load(f)
+        except Exception as exc:
+            failures.append((path, '{}: {}'.format(type(exc).__name__, exc)))
+            continue
+        target = Path(output_dir) / name if output_dir else path.with_suffix('.svg')
+        key = None
+        if cache is not None:
+            desc, overrides = split_document(document)
+            try:
+                key = render_key(desc, **dict(options, **overrides))
+            except Exception:
+                # leave the error to be reported by the renderer
+                pass
+            else:
+                svg = cache.get(key)
+                if svg is not None:
+                    _write_svg(target, svg)
+                    written += 1
+                    continue
+        documents.append(document)
+        targets.append((path, target))
+        keys.append(key)
+
+    slowest = []
+    for result in iter_render_many(documents, jobs=jobs, **options):
+        path, target = targets[result.index]
+        if result.error is not None:
+            failures.append((path, result.error))
+            continue
+        if keys[result.index] is not None:
+            cache.put(keys[result.index], result.svg)
+        _write_svg(target, result.svg)
+        slowest.append((result.seconds, path))
+    written += len(slowest)
+
+    elapsed = time.perf_counter() - start
+    log.write('rendered {} of {} files in {:.2f}s ({} failed)\n'.format(
+        written, len(inputs), elapsed, len(failures)))
+    for seconds, path in sorted(slowest, key=lambda item: item[0], reverse=True)[:5]:
+        log.write('  {:8.3f}s  {}\n'.format(seconds, path))
+    for path, error in failures:
+        log.write('FAILED {}: {}\n'.format(path, error))
+    return len(failures)
+
+
+def _write_svg(target, svg):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(svg)
+
+
+def cache_report(cache):
+    stats = cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    return ('cache {}: {} hits, {} misses ({:.0%} hit rate), '
+            '{} entries, {:.1f} of {:.1f} MiB\n').format(
+        cache.directory, stats['hits'], stats['misses'],
+        stats['hits'] / lookups if lookups else 0.0,
+        stats['entries'], stats['size'] / 2**20, stats['max_size'] / 2**20)
+
+
+def render_remote(url, desc, options):
+    """Render on the server at ``url``; return ``None`` if it is not reachable.
+
+    An empty ``url`` means the server's default address.
+    """
+    from .server import DEFAULT_URL, RenderClient
+    client = RenderClient(url or DEFAULT_URL)
+    try:
+        return client.render(desc, **options)
+    except OSError:
+        return None
+    finally:
+        client.close()
+
+
+def bit_field_cli():
+    # subcommands import their modules on demand to keep startup fast
+    if sys.argv[1:2] == ['serve']:
+        from .server import serve_cli
+        serve_cli(sys.argv[2:])
+        return
+    parser = build_parser()
+    args = parser.parse_args()
+    if not args.input and args.watch is None:
+        parser.error('the following arguments are required: input')
+    json = json_module(args)
+    options = render_options(args)
+
+    if args.watch is not None:
+        from .watch import Watcher
+        watcher = Watcher(args.watch, json, options,
+                          config_path=args.config,
+                          output_dir=args.output_dir)
+        watcher.run(args.interval)
+        return
+
+    from .batch import config_options, split_document
+    if args.config is not None:
+        with open(args.config, 'r') as f:
+            options.update(config_options(json.load(f)))
+
+    single = Path(args.input[0])
+    batch = (args.output_dir is not None
+             or len(args.input) > 1
+             or single.is_dir()
+             or (not single.exists() and glob.has_magic(args.input[0])))
+    cache = None
+    if args.cache_dir:
+        cache = DiskCache(args.cache_dir, max_size=args.cache_size * 2**20)
+    if batch:
+        inputs = expand_inputs(args.input)
+        if args.output_dir is not None:
+            collisions = output_collisions(inputs)
+            if collisions:
+                parser.error('inputs would overwrite each other in {}: {}'.format(
+                    args.output_dir, '; '.join(
+                        '{} <- {}'.format(name, ', '.join(str(path) for path in found))
+                        for name, found in sorted(collisions.items()))))
+        failed = render_files(inputs, json, options,
+                              output_dir=args.output_dir,
+                              jobs=args.jobs,
+                              cache=cache)
+        if cache is not None and args.cache_stats:
+            sys.stderr.write(cache_report(cache))
+        sys.exit(1 if failed else 0)
 
-    with open(args.input, 'r') as f:
-        data = json.load(f)
-        label_cfg = None
-        if args.label_lines is not None:
-            label_cfg = {
-                'label_lines': args.label_lines,
-                'font_size': args.label_fontsize if args.label_fontsize is not None else args.fontsize,
-                'start_line': args.label_start_line,
-                'end_line': args.label_end_line,
-                'layout': args.label_layout,
-            }
-            if args.label_angle is not None:
-                label_cfg['angle'] = args.label_angle
-        res = render(data,
-                     hspace=args.hspace,
-                     vspace=args.vspace,
-                     lanes=args.lanes,
-                     bits=args.bits,
-                     fontfamily=args.fontfamily,
-                     fontweight=args.fontweight,
-                     fontsize=args.fontsize,
-                     compact=args.compact,
-                     hflip=args.hflip,
-                     vflip=args.vflip,
-                     strokewidth=args.strokewidth,
-                     trim=args.trim,
-                     uneven=args.uneven,
-                     legend={key: value for key, value in args.legend} if args.legend else None,
-                     label_lines=label_cfg)
-
-    res = jsonml_stringify(res)
-    if args.beautify:
-        res = beautify(res)
+    with open(args.input[0], 'r') as f:
+        desc, overrides = split_document(json.load(f))
+    options.update(overrides)
+    res = None
+    if args.server is not None:
+        res = render_remote(args.server, desc, options)
+    if res is None:
+        res = render_svg(desc, cache=cache, **options)
     print(res)
+    if cache is not None and args.cache_stats:
+        sys.stderr.write(cache_report(cache))
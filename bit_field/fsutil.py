@@ -0,0 +1,39 @@
+import os
+
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+
+def _create_temp(directory):
+    # unlike mkstemp's private 0600 files, mode 0666 lets the umask decide,
+    # so published files get the usual permissions without reading the umask
+    while True:
+        tmp = os.path.join(directory, '.{}.tmp'.format(os.urandom(8).hex()))
+        try:
+            return os.open(tmp, _TEMP_FLAGS, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def atomic_write(path, data):
+    """Write ``data`` (str or bytes) to ``path`` atomically.
+
+    The content goes to a temporary file in the same directory which then
+    replaces ``path``, so readers see either the old or the new file, never
+    a partial one.
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    fd, tmp = _create_temp(directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
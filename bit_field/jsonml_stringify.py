@@ -1,13 +1,126 @@
-def jsonml_stringify(res):
+_TEXT_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+_ATTR_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+# numbers never need escaping; their repr() equals the str() used by format()
+_NUMBERS = (int, float)
+
+
+class Markup(str):
+    """Serialized markup that :func:`jsonml_stringify` emits as is.
+
+    Use it as a child node to splice a fragment serialized earlier into a
+    tree; plain strings are escaped as text.
+    """
+
+    __slots__ = ()
+
+
+def escape_text(text):
+    if '&' in text or '<' in text or '>' in text:
+        return text.translate(_TEXT_ESCAPES)
+    return text
+
+
+def escape_attribute(value):
+    if type(value) in _NUMBERS:
+        return repr(value)
+    text = value if type(value) is str else '{}'.format(value)
+    if '&' in text or '<' in text or '>' in text or '"' in text:
+        return text.translate(_ATTR_ESCAPES)
+    return text
+
+
+def _attributes(attributes):
+    return ' '.join([
+        f'{k}="{v!r}"' if type(v) in _NUMBERS else f'{k}="{escape_attribute(v)}"'
+        for k, v in attributes.items()
+    ])
+
+
+def start_tag(tag, attributes):
+    return f'<{tag} {_attributes(attributes)}>'
+
+
+def end_tag(tag):
+    return f'</{tag}>'
+
+
+def _serialize(res, out):
+    # strings on the stack are finished markup (closing tags, escaped text),
+    # everything else is a JSONML node still to be expanded
+    stack = [res]
+    pop = stack.pop
+    push = stack.append
+    append = out.append
+    while stack:
+        node = pop()
+        if node is None:
+            continue
+        if isinstance(node, str):
+            append(node)
+            continue
+        tag = node[0]
+        attributes = _attributes(node[1])
+        if len(node) < 3:
+            append(f'<{tag} {attributes}/>')
+            continue
+        first = node[2]
+        if isinstance(first, str) and type(first) is not Markup:
+            if first:
+                append(f'<{tag} {attributes}>{escape_text(first)}</{tag}>')
+            else:
+                append(f'<{tag} {attributes}/>')
+            continue
+        children = node[2:]
+        if first is None and all(child is None for child in children):
+            append(f'<{tag} {attributes}/>')
+            continue
+        append(f'<{tag} {attributes}>')
+        push(f'</{tag}>')
+        for child in reversed(children):
+            push(escape_text(child) if isinstance(child, str) and type(child) is not Markup else child)
+
+
+def _serialize_pretty(res, lines, indent):
+    # one element per line; elements without child elements, and text
+    # elements whose whitespace would be rendered, stay on a single line
+    stack = [(res, 0)]
+    pop = stack.pop
+    push = stack.append
+    append = lines.append
+    while stack:
+        node, depth = pop()
+        if node is None:
+            continue
+        if isinstance(node, str):
+            append(indent * depth + node)
+            continue
+        children = node[2:]
+        if node[0] == 'text' or not any(isinstance(child, list) for child in children):
+            out = [indent * depth]
+            _serialize(node, out)
+            append(''.join(out))
+            continue
+        tag = node[0]
+        append(f'{indent * depth}<{tag} {_attributes(node[1])}>')
+        push((f'</{tag}>', depth))
+        for child in reversed(children):
+            push((escape_text(child) if isinstance(child, str) and type(child) is not Markup else child,
+                  depth + 1))
+
+
+def jsonml_stringify(res, indent=None):
+    """Serialize a JSONML tree to markup.
+
+    With ``indent`` (a number of spaces or an indentation string) every
+    element starts on its own line, nested by depth; the text inside
+    ``text`` elements is kept exactly as is.
+    """
     if res is None:
         return ''
-    tag = res[0]
-    attributes = ' '.join('{}="{}"'.format(k, v) for k, v in res[1].items())
-    if len(res) > 2 and isinstance(res[2], str):
-        content = res[2]
-    else:
-        content = ''.join(jsonml_stringify(child) for child in res[2:])
-    if len(content) > 0:
-        return '<{0} {1}>{2}</{0}>'.format(tag, attributes, content)
-    else:
-        return '<{0} {1}/>'.format(tag, attributes)
+    if indent is not None:
+        lines = []
+        _serialize_pretty(res, lines, ' ' * indent if isinstance(indent, int) else indent)
+        return '\n'.join(lines)
+    out = []
+    _serialize(res, out)
+    return ''.join(out)
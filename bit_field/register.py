@@ -0,0 +1,196 @@
+"""Editable register model that only redraws the lanes an edit touched."""
+import copy
+import uuid
+
+from .cache import cache_key
+from .jsonml_stringify import end_tag, jsonml_stringify, start_tag
+from .render import Renderer, _quantize
+
+
+def _width(e):
+    if 'array' in e:
+        return e['array'][-1] if isinstance(e['array'], list) else e['array']
+    return e.get('bits', 0)
+
+
+class Register(object):
+    """A descriptor plus the SVG chunks of its last rendering.
+
+    Edit fields with :meth:`insert`, :meth:`resize`, :meth:`rename` and
+    :meth:`retype`; each edit marks the lanes it changes as dirty.
+    :meth:`render_svg` then redraws the dirty lanes and the array gaps, label
+    lines and arrow jumps that cross them, and reuses the serialized text of
+    every other part. When an edit changes the overall geometry (the number
+    of lanes, the attribute padding, the style sheet, ...) the next render
+    redraws everything. ``options`` are the :class:`~bit_field.render.Renderer`
+    options; ``use_symbols`` is not supported.
+    """
+
+    def __init__(self, desc, **options):
+        if options.get('use_symbols'):
+            raise ValueError('use_symbols can not be combined with incremental rendering')
+        if (options.get('marker_namespace') is None and not options.get('shared_markers')
+                and not options.get('deterministic_ids')):
+            # cached chunks refer to the markers by id, keep them stable
+            options['marker_namespace'] = uuid.uuid4().hex[:8]
+        self.renderer = Renderer(**options)
+        self._desc = copy.deepcopy(list(desc))
+        self._chunks = {}
+        self._layout = None
+        self._dirty = set()
+        self._dirty_from = 0
+        self.redrawn = ()
+
+    @property
+    def desc(self):
+        """A copy of the current descriptor."""
+        return copy.deepcopy(self._desc)
+
+    @property
+    def dirty_lanes(self):
+        """The lanes the next :meth:`render_svg` redraws."""
+        mod = self.renderer.mod
+        lanes = self.renderer.options['lanes']
+        if lanes is None:
+            lanes = (sum(_width(e) for e in self._fields()) + mod - 1) // mod
+        dirty = {lane for lane in self._dirty if lane < lanes}
+        if self._dirty_from is not None:
+            dirty.update(range(self._dirty_from, lanes))
+        return frozenset(dirty)
+
+    def _fields(self):
+        return (e for e in self._desc
+                if isinstance(e, dict) and ('bits' in e or 'array' in e))
+
+    def _field(self, index):
+        e = self._desc[index]
+        if not (isinstance(e, dict) and ('bits' in e or 'array' in e)):
+            raise ValueError('entry {} is not a field'.format(index))
+        return e
+
+    def _lsb(self, index):
+        return sum(_width(e) for e in self._desc[:index]
+                   if isinstance(e, dict) and ('bits' in e or 'array' in e))
+
+    def _touch(self, index):
+        # the field keeps its bits: only its own lanes change
+        mod = self.renderer.mod
+        lsb = self._lsb(index)
+        width = max(_width(self._desc[index]), 1)
+        self._dirty.update(range(lsb // mod, (lsb + width - 1) // mod + 1))
+
+    def _shift(self, index):
+        # every later field moves: all lanes from the edit onwards change
+        lane = self._lsb(index) // self.renderer.mod
+        if self._dirty_from is None or lane < self._dirty_from:
+            self._dirty_from = lane
+
+    def insert(self, index, field):
+        """Insert a copy of ``field`` before entry ``index``."""
+        if not isinstance(field, dict):
+            raise TypeError('field must be a mapping, got {!r}'.format(field))
+        self._desc.insert(index, copy.deepcopy(field))
+        self._shift(index)
+
+    def resize(self, index, bits):
+        """Change the width of field ``index``, or the length of an array gap."""
+        e = self._field(index)
+        self._shift(index)
+        if 'array' not in e:
+            e['bits'] = bits
+        elif isinstance(e['array'], list):
+            e['array'][-1] = bits
+        else:
+            e['array'] = bits
+
+    def rename(self, index, name):
+        """Set the name of field ``index``; ``None`` removes it."""
+        e = self._field(index)
+        if name is None:
+            e.pop('name', None)
+        else:
+            e['name'] = name
+        self._touch(index)
+
+    def retype(self, index, type):
+        """Set the type of field ``index``; ``None`` removes it."""
+        e = self._field(index)
+        if type is None:
+            e.pop('type', None)
+        else:
+            e['type'] = type
+        self._touch(index)
+
+    def _is_dirty(self, lane):
+        return lane in self._dirty or (self._dirty_from is not None and lane >= self._dirty_from)
+
+    def _stale(self, key, context, plan):
+        kind = key[0]
+        if kind == 'legend':
+            return False
+        if kind == 'gaps':
+            lanes = []
+            bit_pos = 0
+            mod = context.mod
+            for e in plan.entries:
+                if 'array' in e:
+                    end = bit_pos + _width(e)
+                    lanes.extend(range(bit_pos // mod, max(end - 1, bit_pos) // mod + 1))
+                bit_pos += _width(e)
+            return any(self._is_dirty(lane) for lane in lanes)
+        if kind == 'lane':
+            lines = [key[1]]
+        elif kind == 'fold':
+            lines = range(key[1], dict(plan.folds)[key[1]] + 1)
+        elif kind == 'label':
+            cfg = plan.label_lines[key[1]]
+            lines = range(cfg['start_line'], cfg['end_line'] + 1)
+        else:
+            lines = [line for cfg in plan.arrow_jumps
+                     for line in (cfg['start_line'], cfg['jump_to_first'], cfg['jump_to_second'])]
+        return any(self._is_dirty(context._lane_of(line, plan.lanes)) for line in lines)
+
+    @staticmethod
+    def _chunk_key(key, plan):
+        # label lines and arrow jumps are keyed by content: inserting one
+        # shifts the indices of the others without dirtying any lane
+        if key[0] == 'label':
+            return 'label', cache_key(plan.label_lines[key[1]], None)
+        if key[0] == 'arrows':
+            return 'arrows', cache_key(plan.arrow_jumps, None)
+        return key
+
+    def render_svg(self):
+        """Render the register, redrawing only what changed since the last call."""
+        context = self.renderer._context()
+        plan, res, content_group = context._begin(self._desc)
+        header = [start_tag(res[0], res[1])]
+        header.extend(jsonml_stringify(child) for child in res[2:])
+        header.append(start_tag(content_group[0], content_group[1]))
+        layout = (''.join(header), plan.lanes, plan.folds)
+        if layout != self._layout:
+            self._chunks = {}
+        chunks = {}
+        body = []
+        redrawn = []
+        for key, draw in context._parts(plan):
+            chunk_key = self._chunk_key(key, plan)
+            chunk = self._chunks.get(chunk_key)
+            if chunk is None or self._stale(key, context, plan):
+                child = draw()
+                if child is None:
+                    chunk = ''
+                else:
+                    if context._format_number is not None:
+                        _quantize(child, context._format_number)
+                    chunk = jsonml_stringify(child)
+                redrawn.append(key)
+            chunks[chunk_key] = chunk
+            body.append(chunk)
+        self._layout = layout
+        self._chunks = chunks
+        self._dirty = set()
+        self._dirty_from = None
+        self.redrawn = tuple(redrawn)
+        return ''.join(header + body
+                       + [end_tag(content_group[0]), end_tag(res[0])])
@@ -1,6 +1,15 @@
+from .cache import RenderCache, cache_key
+from collections.abc import Mapping
+from .jsonml_stringify import Markup, jsonml_stringify, start_tag, end_tag
 from .tspan import tspan
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from functools import partial
+from types import MappingProxyType
 import colorsys
+import io
 import math
+import re
 import string
 
 import uuid
@@ -8,13 +17,186 @@ import uuid
 def generate_unique_marker_id(base="arrow"):
     return f"{base}-{uuid.uuid4().hex[:8]}"
 
+
+SHARED_MARKER_NAMESPACE = 'shared'
+_MARKER_NAMESPACE_RE = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def _marker_defs(arrow_id, arrow_jump_id):
+    return ['defs', {},
+            ['marker', {
+                'id': arrow_id,
+                'markerWidth': 10,
+                'markerHeight': 6,
+                'refX': 10,
+                'refY': 3,
+                'orient': 'auto-start-reverse',
+                'markerUnits': 'strokeWidth'
+            },
+             ['path', {
+                 'd': 'M0,0 L10,3 L0,6 Z',
+                 'fill': 'black'
+             }]
+            ],
+            ['marker', {
+                'id': arrow_jump_id,
+                'markerWidth': 10,
+                'markerHeight': 6,
+                'refX': 0,
+                'refY': 3,
+                'orient': 'auto',
+                'markerUnits': 'strokeWidth'
+            },
+             ['path', {
+                 'd': 'M0,0 L10,3 L0,6 Z',
+                 'fill': 'black'
+             }]
+            ]]
+
+
+def marker_defs(namespace=SHARED_MARKER_NAMESPACE):
+    """Return a zero-size ``svg`` element holding the arrow markers.
+
+    Inline it once in an HTML page and render each diagram with
+    ``shared_markers=True`` (and the same ``marker_namespace``) so that the
+    diagrams reference these markers instead of carrying their own ``defs``.
+    """
+    return ['svg', {
+        'xmlns': 'http://www.w3.org/2000/svg',
+        'width': 0,
+        'height': 0,
+        'style': 'position:absolute',
+        'aria-hidden': 'true',
+    }, _marker_defs('arrow-' + namespace, 'arrow-jump-head-' + namespace)]
+
+
 DEFAULT_TYPE_COLOR = "rgb(229, 229, 229)"
 
+# serialized lane cages shared by all renderers with cage_cache=True
+_CAGE_CACHE = RenderCache(maxsize=1024)
+
 
 def t(x, y):
     return 'translate({}, {})'.format(x, y)
 
 
+def _num(value):
+    # shortest text for path data: integral values drop their ".0"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+_NUMBER_RE = re.compile(r'-?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?')
+# string attributes made of coordinates; other strings (colours, ids) are kept
+_NUMERIC_STRING_ATTRS = frozenset(['transform', 'points', 'd', 'viewBox'])
+
+
+def _number_formatter(precision):
+    """Return a memoized formatter rounding to ``precision`` decimals.
+
+    Trailing zeros, a trailing decimal point and the leading zero of
+    fractions are dropped: ``26.666666666666668`` becomes ``26.67``, ``0.50``
+    becomes ``.5`` and ``3.0`` becomes ``3``.
+    """
+    memo = {}
+
+    def format_number(value):
+        text = memo.get(value)
+        if text is None:
+            text = '{:.{}f}'.format(value, precision)
+            if '.' in text:
+                text = text.rstrip('0').rstrip('.')
+            if text.startswith('0.'):
+                text = text[1:]
+            elif text.startswith('-0.'):
+                text = '-' + text[2:]
+            elif text == '-0':
+                text = '0'
+            memo[value] = text
+        return text
+
+    return format_number
+
+
+def _quantize(root, format_number):
+    """Round the coordinates of a JSONML tree in place.
+
+    Float attributes and the numbers inside coordinate strings are replaced
+    by their formatted text; text content is left alone. Attribute mappings
+    are replaced rather than modified since they may be shared.
+    """
+    def replace(match):
+        return format_number(float(match.group()))
+
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if type(node) is not list:
+            continue
+        attrs = node[1]
+        changed = None
+        for key, value in attrs.items():
+            if type(value) is float:
+                value = format_number(value)
+            elif key in _NUMERIC_STRING_ATTRS and type(value) is str:
+                value = _NUMBER_RE.sub(replace, value)
+            else:
+                continue
+            if changed is None:
+                changed = dict(attrs)
+            changed[key] = value
+        if changed is not None:
+            node[1] = changed
+        stack.extend(node[2:])
+    return root
+
+
+def _lines_path(lines, attrs):
+    """Merge ``line`` elements into one ``path`` using relative commands.
+
+    Returns ``None`` when there is nothing to draw.
+    """
+    commands = []
+    x = y = None
+    for line in lines:
+        a = line[1]
+        x1 = a.get('x1', 0)
+        y1 = a.get('y1', 0)
+        x2 = a.get('x2', 0)
+        y2 = a['y2']
+        if x is None:
+            commands.append('M{} {}'.format(_num(x1), _num(y1)))
+        elif x1 != x or y1 != y:
+            commands.append('m{} {}'.format(_num(x1 - x), _num(y1 - y)))
+        if y1 == y2:
+            commands.append('h' + _num(x2 - x1))
+        elif x1 == x2:
+            commands.append('v' + _num(y2 - y1))
+        else:
+            commands.append('l{} {}'.format(_num(x2 - x1), _num(y2 - y1)))
+        x, y = x2, y2
+    if not commands:
+        return None
+    return ['path', dict({'d': ''.join(commands)}, **attrs)]
+
+
+def _rects_path(rects, attrs):
+    """Merge axis-aligned ``(left, top, right, bottom)`` rectangles into one ``path``."""
+    commands = []
+    x = y = None
+    for left, top, right, bottom in rects:
+        if x is None:
+            commands.append('M{} {}'.format(_num(left), _num(top)))
+        else:
+            commands.append('m{} {}'.format(_num(left - x), _num(top - y)))
+        commands.append('h{}v{}h{}z'.format(
+            _num(right - left), _num(bottom - top), _num(left - right)))
+        # "z" returns to the start of the subpath
+        x, y = left, top
+    return ['path', dict({'d': ''.join(commands)}, **attrs)]
+
+
 def typeStyle(t):
     return 'fill:' + typeColor(t)
 
@@ -34,6 +216,24 @@ def _normalize_color(color):
     return text
 
 
+def _type_aliases(key, value):
+    """Return the type names under which a ``types`` entry can be referenced."""
+    aliases = [key]
+    if isinstance(value, dict):
+        label = value.get('label')
+        if label is not None:
+            aliases.append(label)
+        value_alias = value.get('value')
+        if value_alias is not None:
+            aliases.append(value_alias)
+        aliases_config = value.get('aliases')
+        if isinstance(aliases_config, (list, tuple, set)):
+            aliases.extend(aliases_config)
+        elif aliases_config is not None:
+            aliases.append(aliases_config)
+    return [str(alias) for alias in aliases if alias is not None]
+
+
 def _parse_type_overrides(types):
     if types is None:
         return {}
@@ -42,46 +242,33 @@ def _parse_type_overrides(types):
 
     overrides = {}
     for key, value in types.items():
-        aliases = [key]
-        color = None
-
         if isinstance(value, dict):
             color = _normalize_color(value.get('color'))
-            label = value.get('label')
-            if label is not None:
-                aliases.append(label)
-            value_alias = value.get('value')
-            if value_alias is not None:
-                aliases.append(value_alias)
-            aliases_config = value.get('aliases')
-            if isinstance(aliases_config, (list, tuple, set)):
-                aliases.extend(aliases_config)
-            elif aliases_config is not None:
-                aliases.append(aliases_config)
         else:
             color = _normalize_color(value)
 
         if not isinstance(color, str):
             continue
 
-        for alias in aliases:
-            if alias is None:
-                continue
-            overrides[str(alias)] = color
+        for alias in _type_aliases(key, value):
+            overrides[alias] = color
 
     return overrides
 
 
-def _type_color_value(t, overrides=None):
-    styles = {
-        '2': 0,
-        '3': 80,
-        '4': 170,
-        '5': 45,
-        '6': 126,
-        '7': 215,
-    }
+def _hue_color(hue):
+    r, g, b = colorsys.hls_to_rgb(hue / 360, 0.9, 1)
+    return "rgb({:.0f}, {:.0f}, {:.0f})".format(r * 255, g * 255, b * 255)
+
+
+# colours of the built-in types, resolved once instead of for every rect
+_TYPE_COLORS = {
+    key: _hue_color(hue)
+    for key, hue in {'2': 0, '3': 80, '4': 170, '5': 45, '6': 126, '7': 215}.items()
+}
+
 
+def _type_color_value(t, overrides=None):
     if isinstance(t, list):
         if len(t) == 3 and all(isinstance(x, int) and 0 <= x <= 255 for x in t):
             r, g, b = t
@@ -94,9 +281,8 @@ def _type_color_value(t, overrides=None):
             return overrides[key]
 
     t = str(t)
-    if t in styles:
-        r, g, b = colorsys.hls_to_rgb(styles[t] / 360, 0.9, 1)
-        return "rgb({:.0f}, {:.0f}, {:.0f})".format(r * 255, g * 255, b * 255)
+    if t in _TYPE_COLORS:
+        return _TYPE_COLORS[t]
     if "#" in t and len(t) == 7:
         return t
     return DEFAULT_TYPE_COLOR
@@ -106,6 +292,109 @@ def typeColor(t):
     return _type_color_value(t)
 
 
+def _read_only(self, *args, **kwargs):
+    raise TypeError('renderer options are read-only')
+
+
+class _FrozenDict(dict):
+    # a dict for code that checks isinstance(value, dict), but immutable
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return _FrozenDict, (dict(self),)
+
+
+class _FrozenList(list):
+    # likewise for RGB triplets, which must stay lists to be recognized
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return _FrozenList, (list(self),)
+
+
+def _freeze(value):
+    """Return a read-only deep copy of the dicts and lists in ``value``."""
+    if isinstance(value, Mapping):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return _FrozenList(_freeze(item) for item in value)
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class RenderOptions(Mapping):
+    """Read-only, hashable mapping of the options of a :class:`Renderer`.
+
+    Options are compared and hashed by content, so renderers configured
+    alike have equal options and can share compiled layouts. Nested values
+    (``legend``, ``types``, ``label_lines`` and ``arrow_jumps``) are
+    read-only too, so the hash can't go stale.
+    """
+
+    __slots__ = ('_options', '_key')
+
+    def __init__(self, options):
+        self._options = dict(options)
+        self._key = cache_key(self._options, None)
+
+    def __getitem__(self, key):
+        return self._options[key]
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __eq__(self, other):
+        if isinstance(other, RenderOptions):
+            return self._key == other._key
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return 'RenderOptions({!r})'.format(self._options)
+
+
+@dataclass(frozen=True, eq=False)
+class LayoutPlan:
+    """Normalized descriptor plus the layout geometry derived from it.
+
+    Built by :func:`compile_layout` or :meth:`Renderer.compile`. The plan owns
+    read-only copies of every entry, so the caller's descriptor is never
+    modified and one plan can be rendered repeatedly, from any thread.
+    """
+    options: 'RenderOptions'
+    entries: tuple  # fields and array gaps, in descriptor order
+    label_lines: tuple
+    arrow_jumps: tuple
+    total_bits: int
+    lanes: int
+    hidden_array_ranges: tuple
+    field_boundaries: frozenset
+    lane_fields: tuple  # per lane index, the fields drawn in that lane
+    folds: tuple  # (first, last) rows drawn as one elision marker
+    row_map: tuple  # drawn row of every row once folded, None when not folding
+    lane_range: tuple  # (first, last) rows drawn
+    vlane: float
+    attr_padding: float
+    lane_spacing: float
+    height: float
+    left_margin: float
+    right_margin: float
+    label_margin: float
+    label_gap: float
+    label_width: float
+    cage_width: float
+
+
 class Renderer(object):
     ARROW_JUMP_HEAD_LENGTH = 10
 
@@ -129,6 +418,16 @@ class Renderer(object):
                  grid_draw=True,
                  number_draw=True,
                  types=None,
+                 marker_namespace=None,
+                 deterministic_ids=False,
+                 shared_markers=False,
+                 css_classes=False,
+                 coalesce_paths=False,
+                 precision=None,
+                 fold_lanes=False,
+                 use_symbols=False,
+                 cage_cache=False,
+                 lane_range=None,
                  **extra_kwargs):
         if vspace <= 19:
             raise ValueError(
@@ -148,8 +447,6 @@ class Renderer(object):
         self.vspace = vspace
         self.hspace = hspace
         self.bits = bits  # bits per lane
-        self.lanes = lanes  # computed in render if None
-        self.total_bits = None
         self.fontsize = fontsize
         self.fontfamily = fontfamily
         self.fontweight = fontweight
@@ -159,27 +456,105 @@ class Renderer(object):
         self.stroke_width = strokewidth
         self.trim_char_width = trim
         self.uneven = uneven
+        # read-only copies, so neither the caller's objects nor the options
+        # can change a configured renderer
+        legend = _freeze(legend)
         self.legend = legend
         if label_lines is not None and not isinstance(label_lines, list):
-            self.label_lines = [label_lines]
-        else:
-            self.label_lines = label_lines
+            label_lines = [label_lines]
+        label_lines = _freeze(label_lines)
         arrow_jumps = extra_kwargs.pop('arrow_jumps', arrow_jumps)
         if arrow_jumps is not None and not isinstance(arrow_jumps, list):
-            self.arrow_jumps = [arrow_jumps]
-        else:
-            self.arrow_jumps = arrow_jumps
-        types = extra_kwargs.pop('types', types)
+            arrow_jumps = [arrow_jumps]
+        arrow_jumps = _freeze(arrow_jumps)
+        types = _freeze(extra_kwargs.pop('types', types))
         if extra_kwargs:
             unexpected = ', '.join(sorted(extra_kwargs))
             raise TypeError(f'Renderer.__init__() got unexpected keyword argument(s): {unexpected}')
 
+        if precision is not None and not (
+                isinstance(precision, int) and not isinstance(precision, bool) and precision >= 0):
+            raise ValueError(
+                'precision must be None or a non-negative integer, got {!r}.'.format(precision))
+
+        if lane_range is not None:
+            if not (isinstance(lane_range, (list, tuple)) and len(lane_range) == 2
+                    and all(isinstance(v, int) and not isinstance(v, bool) for v in lane_range)
+                    and 0 <= lane_range[0] <= lane_range[1]):
+                raise ValueError(
+                    'lane_range must be a (first, last) pair of rows with 0 <= first <= last, '
+                    'got {!r}.'.format(lane_range))
+            lane_range = tuple(lane_range)
+
+        if marker_namespace is not None and not (
+                isinstance(marker_namespace, str) and _MARKER_NAMESPACE_RE.match(marker_namespace)):
+            raise ValueError(
+                'marker_namespace must only contain letters, digits, "_", "." and "-", '
+                'got {!r}.'.format(marker_namespace))
+
         self.grid_draw = grid_draw
         self.number_draw = number_draw
+        self.marker_namespace = marker_namespace
+        self.deterministic_ids = deterministic_ids
+        self.shared_markers = shared_markers
+        self.css_classes = css_classes
+        self.coalesce_paths = coalesce_paths
+        self.precision = precision
+        self.fold_lanes = fold_lanes
+        self.use_symbols = use_symbols
+        self.cage_cache = cage_cache
+        self.lane_range = lane_range
         self.bit_label_height = self.fontsize * 1.2 if self.number_draw else 0
         self.type_overrides = _parse_type_overrides(types)
-        self.attr_padding = 0
-        self.lane_spacing = self.vspace
+        self.mod = bits
+        # configuration as given; render() never modifies the renderer, its
+        # per-call state lives on a render context (see _context())
+        self.options = RenderOptions({
+            'vspace': vspace,
+            'hspace': hspace,
+            'bits': bits,
+            'lanes': lanes,
+            'fontsize': fontsize,
+            'fontfamily': fontfamily,
+            'fontweight': fontweight,
+            'compact': compact,
+            'hflip': hflip,
+            'vflip': vflip,
+            'strokewidth': strokewidth,
+            'trim': trim,
+            'uneven': uneven,
+            'legend': legend,
+            'label_lines': label_lines,
+            'arrow_jumps': arrow_jumps,
+            'grid_draw': grid_draw,
+            'number_draw': number_draw,
+            'types': types,
+            'marker_namespace': marker_namespace,
+            'deterministic_ids': deterministic_ids,
+            'shared_markers': shared_markers,
+            'css_classes': css_classes,
+            'coalesce_paths': coalesce_paths,
+            'precision': precision,
+            'fold_lanes': fold_lanes,
+            'use_symbols': use_symbols,
+            'cage_cache': cage_cache,
+            'lane_range': lane_range,
+        })
+
+    def _context(self, plan=None):
+        """Return a fresh render context for one call.
+
+        The context is a copy of this renderer sharing its (read-only)
+        configuration; everything a render assigns to ``self`` lands on the
+        context, so one renderer can serve concurrent calls. Given a
+        :class:`LayoutPlan`, the context starts with its layout applied.
+        """
+        context = object.__new__(type(self))
+        context.__dict__.update(self.__dict__)
+        context._fold_above = context._fold_below = False
+        if plan is not None:
+            context._apply_plan(plan)
+        return context
 
     def get_total_bits(self, desc):
         lsb = 0
@@ -198,45 +573,65 @@ class Renderer(object):
     def type_style(self, value):
         return 'fill:' + self.type_color(value)
 
-    def _extract_label_lines(self, desc):
-        collected = []
-        filtered = []
-        for e in desc:
-            if isinstance(e, dict) and 'label_lines' in e:
-                collected.append(e)
-            else:
-                filtered.append(e)
-        if collected:
-            if self.label_lines is None:
-                self.label_lines = collected
-            else:
-                self.label_lines.extend(collected)
-        return filtered
-
-    def _extract_arrow_jumps(self, desc):
-        collected = []
-        filtered = []
-        for e in desc:
-            if isinstance(e, dict) and 'arrow_jump' in e:
-                collected.append(e)
-            else:
-                filtered.append(e)
-        if collected:
-            if self.arrow_jumps is None:
-                self.arrow_jumps = collected
-            else:
-                self.arrow_jumps.extend(collected)
-        return filtered
+    def _font(self, size=None):
+        """Font attributes of a ``text`` element, or its class with ``css_classes``."""
+        if size is None:
+            size = self.fontsize
+        if self.css_classes:
+            return {'class': self._font_classes[size]}
+        return {
+            'font-size': size,
+            'font-family': self.fontfamily,
+            'font-weight': self.fontweight,
+        }
 
-    def _label_lines_margins(self):
-        self.cage_width = self.hspace / self.mod
-        self.label_gap = self.cage_width / 2
-        self.label_width = self.cage_width
+    def _fill(self, value):
+        """Fill of a shape coloured by type ``value``."""
+        color = self.type_color(value)
+        if self.css_classes:
+            return {'class': self._fill_classes[color]}
+        return {'fill': color}
+
+    def _style_sheet(self, plan):
+        """Assign classes to the font sizes and type colours of ``plan``.
+
+        Returns the scope class for the ``svg`` root and the ``style``
+        element. The scope is derived from the rules themselves, so documents
+        inlined into one page only share classes that style identically.
+        """
+        sizes = [self.fontsize]
+        sizes.extend(cfg.get('font_size', self.fontsize) for cfg in plan.label_lines)
+        self._font_classes = {}
+        for size in sizes:
+            self._font_classes.setdefault(size, 't{}'.format(len(self._font_classes)))
+
+        values = [e.get('type') for e in plan.entries
+                  if 'bits' in e or e.get('type') is not None]
+        if self.legend:
+            values.extend(self.legend.values())
+        self._fill_classes = {}
+        for value in values:
+            color = self.type_color(value)
+            self._fill_classes.setdefault(color, 'c{}'.format(len(self._fill_classes)))
+
+        rules = ['text{{font-family:{};font-weight:{}}}'.format(self.fontfamily, self.fontweight)]
+        rules.extend('.{}{{font-size:{}px}}'.format(name, size)
+                     for size, name in self._font_classes.items())
+        rules.extend('.{}{{fill:{}}}'.format(name, color)
+                     for color, name in self._fill_classes.items())
+        scope = 'bf-' + cache_key(rules, None)[:8]
+        css = ''.join('.{} {}'.format(scope, rule) for rule in rules)
+        return scope, ['style', {}, css]
+
+    def _label_lines_margins(self, label_items, arrow_items):
+        """Assign ``_margin``/``_offset`` (and ``_outer_distance`` for arrow
+        jumps) to the given label and arrow configs and return the left and
+        right canvas margins they need."""
+        cage_width = self.hspace / self.mod
+        label_gap = cage_width / 2
+        label_width = cage_width
         left_margin = right_margin = 0
 
-        label_items = self.label_lines or []
-        arrow_items = self.arrow_jumps or []
-
         for side in ('left', 'right'):
             active = []
             side_items = []
@@ -251,15 +646,15 @@ class Renderer(object):
                     angle = cfg.get('angle', 0) or 0
                     normalized = angle % 360
                     is_vertical = math.isclose(normalized % 180, 90, abs_tol=1e-6)
-                    text_gap = 20 if is_vertical else self.label_gap
+                    text_gap = 20 if is_vertical else label_gap
                     angle_rad = math.radians(angle)
                     horizontal_extent = (
                         abs(text_length * math.cos(angle_rad))
                         + font_size * abs(math.sin(angle_rad))
                     )
                     margin = (
-                        self.label_width / 2
-                        + self.label_gap
+                        label_width / 2
+                        + label_gap
                         + text_gap
                         + horizontal_extent
                     )
@@ -307,96 +702,240 @@ class Renderer(object):
                     else:
                         right_margin = max(right_margin, margin)
 
-        self.label_margin = max(left_margin, right_margin)
         return left_margin, right_margin
 
-    def render(self, desc):
-        desc = self._extract_label_lines(desc)
-        desc = self._extract_arrow_jumps(desc)
-
-        self.total_bits = self.get_total_bits(desc)
-        if self.lanes is None:
-            self.lanes = (self.total_bits + self.bits - 1) // self.bits
-        mod = self.bits
-        self.mod = mod
+    def compile(self, desc):
+        """Normalize ``desc`` into a :class:`LayoutPlan` for this renderer.
+
+        Field positions, attribute entries, label and arrow placement and the
+        overall canvas geometry are computed in a single pass over the
+        descriptor. ``desc`` itself is left untouched.
+        """
+        label_lines = [dict(cfg) for cfg in self.options['label_lines'] or []]
+        arrow_jumps = [dict(cfg) for cfg in self.options['arrow_jumps'] or []]
+        mod = self.mod
+        entries = []
+        hidden_array_ranges = []
+        field_boundaries = set()
+        max_attr_height = 0
         lsb = 0
-        msb = self.total_bits - 1
-        self.hidden_array_ranges = []
         for e in desc:
+            if isinstance(e, dict) and 'label_lines' in e:
+                label_lines.append(dict(e))
+                continue
+            if isinstance(e, dict) and 'arrow_jump' in e:
+                arrow_jumps.append(dict(e))
+                continue
+            if not isinstance(e, dict):
+                entries.append(e)
+                continue
+            entry = dict(e)
             if 'array' in e:
                 length = e['array'][-1] if isinstance(e['array'], list) else e['array']
-                if isinstance(e, dict) and e.get('hide_lines'):
-                    self.hidden_array_ranges.append((lsb, lsb + length))
+                if e.get('hide_lines'):
+                    hidden_array_ranges.append((lsb, lsb + length))
                 lsb += length
-                continue
-            if 'bits' not in e:
-                continue
-            e['lsb'] = lsb
-            lsb += e['bits']
-            e['msb'] = lsb - 1
-            e['lsbm'] = e['lsb'] % mod
-            e['msbm'] = e['msb'] % mod
-            if 'type' not in e:
-                e['type'] = None
-
-        if self.label_lines is not None:
-            self._validate_label_lines()
-        if self.arrow_jumps is not None:
-            self._validate_arrow_jumps()
-
-        self.attr_padding = 0
-        max_attr_height = 0
-        for e in desc:
+            elif 'bits' in e:
+                entry['lsb'] = lsb
+                field_boundaries.add(lsb)
+                lsb += e['bits']
+                entry['msb'] = lsb - 1
+                entry['lsbm'] = entry['lsb'] % mod
+                entry['msbm'] = entry['msb'] % mod
+                if 'type' not in e:
+                    entry['type'] = None
             attr_entries = self._prepare_attr_entries(e.get('attr'))
             if attr_entries:
-                e['_attr_entries'] = attr_entries
-                total_height = sum(entry['spacing'] for entry in attr_entries)
+                total_height = sum(item['spacing'] for item in attr_entries)
                 max_attr_height = max(max_attr_height, total_height)
-            else:
-                e['_attr_entries'] = []
+            entry['_attr_entries'] = tuple(attr_entries)
+            entries.append(entry)
+
+        hidden_array_ranges.sort()
+        return self._build_plan(entries, label_lines, arrow_jumps, lsb,
+                                hidden_array_ranges, field_boundaries, max_attr_height)
+
+    def _build_plan(self, entries, label_lines, arrow_jumps, total_bits,
+                    hidden_array_ranges, field_boundaries, max_attr_height):
+        """Derive the canvas geometry and assemble the :class:`LayoutPlan`.
+
+        ``entries`` are the private copies made by the entry pass of
+        :meth:`compile`, with ``lsb``/``msb`` already assigned.
+        """
+        lanes = self.options['lanes']
+        if lanes is None:
+            lanes = (total_bits + self.bits - 1) // self.bits
+
+        if label_lines:
+            self._validate_label_lines(label_lines, lanes)
+        if arrow_jumps:
+            self._validate_arrow_jumps(arrow_jumps, lanes)
+
+        entries = tuple(
+            MappingProxyType(e) if isinstance(e, dict) else e
+            for e in entries
+        )
+        lane_fields = self._bucket_fields_by_lane(entries, lanes)
+        folds = ()
+        row_map = None
+        if self.fold_lanes:
+            folds = self._fold_lanes(entries, lane_fields, lanes, total_bits,
+                                     label_lines, arrow_jumps)
+            if folds:
+                row_map = self._fold_row_map(folds, lanes)
+        first, last = 0, lanes - 1
+        if self.lane_range is not None:
+            first, last = self.lane_range
+            if last >= lanes:
+                raise ValueError('lane_range exceeds number of lanes')
+        if row_map is not None:
+            rows = row_map[last] - row_map[first] + 1
+        else:
+            rows = last - first + 1
 
+        vlane = self.vspace - self.bit_label_height
         if not self.compact:
-            self.vlane = self.vspace - self.bit_label_height
-            self.attr_padding = max_attr_height
-            self.lane_spacing = self.vspace + self.attr_padding
-            height = self.lane_spacing * self.lanes + self.stroke_width / 2
+            attr_padding = max_attr_height
+            lane_spacing = self.vspace + attr_padding
         else:
-            self.vlane = self.vspace - self.bit_label_height
-            self.attr_padding = 0
-            self.lane_spacing = self.vspace
-            height = self.vlane * (self.lanes - 1) + self.vspace + self.stroke_width / 2
-        if self.legend:
-            height += self.fontsize * 1.2
+            attr_padding = 0
+            lane_spacing = self.vspace
+        height = self._canvas_height(rows, lane_spacing)
 
         left_margin = right_margin = 0
-        self.label_margin = 0
-        self.label_gap = 0
-        self.label_width = 0
-        self.cage_width = 0 
-        if self.label_lines is not None or self.arrow_jumps is not None:
-            left_margin, right_margin = self._label_lines_margins()
-
-            has_left = any(
-                cfg.get('layout') == 'left'
-                for cfg in (self.label_lines or [])
-            ) or any(
-                cfg.get('layout') == 'left'
-                for cfg in (self.arrow_jumps or [])
-            )
-            has_right = any(
-                cfg.get('layout') == 'right'
-                for cfg in (self.label_lines or [])
-            ) or any(
-                cfg.get('layout') == 'right'
-                for cfg in (self.arrow_jumps or [])
-            )
-
-            if has_left:
+        label_margin = label_gap = label_width = cage_width = 0
+        if self.lane_range is not None:
+            # only what is drawn in the window needs room beside it
+            label_lines = [cfg for cfg in label_lines
+                           if cfg['end_line'] >= first and cfg['start_line'] <= last]
+            arrow_jumps = [cfg for cfg in arrow_jumps
+                           if all(first <= cfg[key] <= last
+                                  for key in ('start_line', 'jump_to_first', 'jump_to_second'))]
+        if label_lines or arrow_jumps:
+            left_margin, right_margin = self._label_lines_margins(label_lines, arrow_jumps)
+            label_margin = max(left_margin, right_margin)
+            cage_width = self.hspace / self.mod
+            label_gap = cage_width / 2
+            label_width = cage_width
+
+            layouts = {cfg.get('layout') for cfg in label_lines + arrow_jumps}
+            if 'left' in layouts:
                 left_margin += 5
-            if has_right:
+            if 'right' in layouts:
                 right_margin += 5
 
-        canvas_width = self.hspace + left_margin + right_margin
+        return LayoutPlan(
+            options=self.options,
+            entries=entries,
+            label_lines=tuple(MappingProxyType(cfg) for cfg in label_lines),
+            arrow_jumps=tuple(MappingProxyType(cfg) for cfg in arrow_jumps),
+            total_bits=total_bits,
+            lanes=lanes,
+            hidden_array_ranges=tuple(hidden_array_ranges),
+            field_boundaries=frozenset(field_boundaries),
+            lane_fields=lane_fields,
+            folds=folds,
+            row_map=row_map,
+            lane_range=(first, last),
+            vlane=vlane,
+            attr_padding=attr_padding,
+            lane_spacing=lane_spacing,
+            height=height,
+            left_margin=left_margin,
+            right_margin=right_margin,
+            label_margin=label_margin,
+            label_gap=label_gap,
+            label_width=label_width,
+            cage_width=cage_width,
+        )
+
+    def _canvas_height(self, rows, lane_spacing):
+        if not self.compact:
+            height = lane_spacing * rows + self.stroke_width / 2
+        else:
+            height = (self.vspace - self.bit_label_height) * (rows - 1) + self.vspace + self.stroke_width / 2
+        if self.legend:
+            height += self.fontsize * 1.2
+        return height
+
+    def page_ranges(self, desc, max_height):
+        """Split ``desc`` into lane windows no taller than ``max_height``.
+
+        Returns the ``(first, last)`` row ranges to render one page each with
+        the ``lane_range`` option. Folded rows are never split across pages.
+        """
+        plan = self._plan_for(desc)
+        row_map = plan.row_map
+        if row_map is None:
+            row_map = range(plan.lanes)
+        page_rows = 0
+        while (page_rows < row_map[-1] + 1
+               and self._canvas_height(page_rows + 1, plan.lane_spacing) <= max_height):
+            page_rows += 1
+        if page_rows == 0:
+            raise ValueError('max_height {} does not fit a single lane'.format(max_height))
+        ranges = []
+        first = 0
+        for line in range(1, plan.lanes):
+            if row_map[line] - row_map[first] >= page_rows:
+                ranges.append((first, line - 1))
+                first = line
+        ranges.append((first, plan.lanes - 1))
+        return ranges
+
+    def _marker_ids(self, plan):
+        namespace = self.marker_namespace
+        if namespace is None and self.shared_markers:
+            namespace = SHARED_MARKER_NAMESPACE
+        if namespace is None and self.deterministic_ids:
+            namespace = _plan_key(plan)[:8]
+        if namespace is None:
+            return (generate_unique_marker_id('arrow'),
+                    generate_unique_marker_id('arrow-jump-head'))
+        return 'arrow-' + namespace, 'arrow-jump-head-' + namespace
+
+    def _apply_plan(self, plan):
+        self.total_bits = plan.total_bits
+        self.lanes = plan.lanes
+        self.hidden_array_ranges = list(plan.hidden_array_ranges)
+        # boundary index: cage() and the hidden range lookups run for every
+        # bit of every lane, so they must not rescan the descriptor
+        self._hidden_starts = [start for start, _ in plan.hidden_array_ranges]
+        self.field_boundaries = plan.field_boundaries
+        self.lane_fields = plan.lane_fields
+        self._row_map = plan.row_map
+        self._window = plan.lane_range
+        self._first_row = 0
+        self._first_row = self._row(plan.lane_range[0])
+        self.label_lines = list(plan.label_lines) if plan.label_lines else None
+        self.arrow_jumps = list(plan.arrow_jumps) if plan.arrow_jumps else None
+        self.vlane = plan.vlane
+        self.attr_padding = plan.attr_padding
+        self.lane_spacing = plan.lane_spacing
+        self.label_margin = plan.label_margin
+        self.label_gap = plan.label_gap
+        self.label_width = plan.label_width
+        self.cage_width = plan.cage_width
+
+    def _plan_for(self, desc):
+        if isinstance(desc, LayoutPlan):
+            if desc.options != self.options:
+                raise ValueError('layout plan was compiled for different renderer options')
+            return desc
+        return self.compile(desc)
+
+    def _begin(self, desc):
+        """Apply the plan for ``desc`` and return the document skeleton.
+
+        Returns the ``svg`` root (with its ``defs``) and the content group,
+        both still without their drawn children.
+        """
+        plan = self._plan_for(desc)
+        self._apply_plan(plan)
+
+        left_margin = plan.left_margin
+        canvas_width = self.hspace + left_margin + plan.right_margin
+        height = plan.height
 
         res = ['svg', {
             'xmlns': 'http://www.w3.org/2000/svg',
@@ -404,73 +943,267 @@ class Renderer(object):
             'height': height,
             'viewBox': ' '.join(str(x) for x in [0, 0, canvas_width, height])
         }]
-        
-        self.arrow_id = generate_unique_marker_id('arrow')
-        self.arrow_jump_id = generate_unique_marker_id('arrow-jump-head')
-
-        arrow_def = ['defs', {},
-                     ['marker', {
-                         'id': self.arrow_id,
-                         'markerWidth': 10,
-                         'markerHeight': 6,
-                         'refX': 10,
-                         'refY': 3,
-                         'orient': 'auto-start-reverse',
-                         'markerUnits': 'strokeWidth'
-                     },
-                      ['path', {
-                          'd': 'M0,0 L10,3 L0,6 Z',
-                          'fill': 'black'
-                      }]
-                     ],
-                     ['marker', {
-                         'id': self.arrow_jump_id,
-                         'markerWidth': 10,
-                         'markerHeight': 6,
-                         'refX': 0,
-                         'refY': 3,
-                         'orient': 'auto',
-                         'markerUnits': 'strokeWidth'
-                     },
-                      ['path', {
-                          'd': 'M0,0 L10,3 L0,6 Z',
-                          'fill': 'black'
-                     }]
-                    ]]
-
-        res.append(arrow_def)
+
+        self.arrow_id, self.arrow_jump_id = self._marker_ids(plan)
+        if not self.shared_markers:
+            res.append(_marker_defs(self.arrow_id, self.arrow_jump_id))
+        if self.css_classes:
+            scope, style = self._style_sheet(plan)
+            res[1]['class'] = scope
+            res.append(style)
+        self._symbol_ids = {}
+        self._new_symbols = []
+        if self.use_symbols:
+            res[1]['xmlns:xlink'] = 'http://www.w3.org/1999/xlink'
+            # symbol ids are content hashes; documents inlined into one page
+            # only share a symbol if it draws identically in both
+            self._symbol_salt = [self.precision, res[1].get('class')]
 
         content_group_attrs = {}
         if left_margin:
             content_group_attrs['transform'] = t(left_margin, 0)
         content_group = ['g', content_group_attrs]
-
+        self._format_number = None
+        if self.precision is not None:
+            self._format_number = _number_formatter(self.precision)
+            _quantize(res, self._format_number)
+            _quantize(content_group, self._format_number)
+        return plan, res, content_group
+
+    def _content(self, plan):
+        """Yield the children of the content group one at a time."""
+        if self._format_number is None:
+            yield from self._draw(plan)
+            return
+        for child in self._draw(plan):
+            yield _quantize(child, self._format_number)
+
+    def _parts(self, plan):
+        """Yield ``(key, draw)`` for every child of the content group.
+
+        ``draw()`` returns the child, or ``None`` if there is nothing to
+        draw. Parts must be drawn in order, since each lane sets the row
+        state of the render. Keys are ``('legend',)``, ``('gaps',)``,
+        ``('lane', line)``, ``('fold', line)``, ``('label', n)`` and
+        ``('arrows',)``.
+        """
+        desc = plan.entries
         if self.legend:
-            content_group.append(self.legend_items())
+            yield ('legend',), self.legend_items
 
         # draw array gaps (unknown length fields)
-        content_group.append(self.array_gaps(desc))
-
-        for i in range(0, self.lanes):
-            if self.hflip:
-                self.lane_index = i
-            else:
-                self.lane_index = self.lanes - i - 1
-            self.index = i
-            content_group.append(self.lane(desc))
+        yield ('gaps',), partial(self.array_gaps, desc)
+
+        folds = dict(plan.folds)
+        fold_ends = {last for _, last in plan.folds}
+        first_row, last_row = plan.lane_range
+        i = first_row
+        for first, last in plan.folds:
+            if first < i <= last:
+                # the window starts inside a fold: its marker comes first
+                i = first
+        while i <= last_row:
+            last = folds.get(i)
+            if last is not None:
+                yield ('fold', i), partial(self._fold_at, i, last)
+                i = last + 1
+                continue
+            # compact lanes share edges; next to a marker or the window edge
+            # they draw their own
+            yield ('lane', i), partial(self._lane_at, desc, i,
+                                       i - 1 in fold_ends or i == first_row,
+                                       i + 1 in folds or i == last_row)
+            i += 1
         if self.label_lines is not None:
-            for cfg in self.label_lines:
-                content_group.append(self._label_lines_element(cfg))
+            for n, cfg in enumerate(self.label_lines):
+                if cfg['end_line'] >= first_row and cfg['start_line'] <= last_row:
+                    yield ('label', n), partial(self._label_lines_element, cfg)
         if self.arrow_jumps:
-            arrow_group = self._arrow_jump_elements()
-            if arrow_group is not None:
-                content_group.append(arrow_group)
+            yield ('arrows',), self._arrow_jump_elements
+
+    def _fold_at(self, first, last):
+        self.index = self._row(first)
+        return self.fold_marker(first, last)
+
+    def _lane_at(self, desc, line, edge_above, edge_below):
+        self.index = self._row(line)
+        self.lane_index = self._lane_of(line, self.lanes)
+        self._fold_above = edge_above
+        self._fold_below = edge_below
+        return self.lane(desc)
+
+    def _draw(self, plan):
+        for _, draw in self._parts(plan):
+            child = draw()
+            if self._new_symbols:
+                # defined right before their first use so output can stream
+                yield ['defs', {}, *self._new_symbols]
+                self._new_symbols = []
+            if child is not None:
+                yield child
+
+    def render(self, desc):
+        context = self._context()
+        plan, res, content_group = context._begin(desc)
+        content_group.extend(context._content(plan))
         res.append(content_group)
         return res
 
-    def _validate_label_lines(self):
+    def iter_svg(self, desc):
+        """Yield the serialized SVG document in chunks.
+
+        The header and ``defs`` come first, then every legend, gap, lane,
+        label and arrow group as soon as it is drawn, so memory use does not
+        grow with the number of lanes. Joining the chunks gives the same
+        text as ``jsonml_stringify(self.render(desc))``.
+        """
+        context = self._context()
+        plan, res, content_group = context._begin(desc)
+        yield start_tag(res[0], res[1])
+        for child in res[2:]:
+            yield jsonml_stringify(child)
+        yield start_tag(content_group[0], content_group[1])
+        for child in context._content(plan):
+            yield jsonml_stringify(child)
+        yield end_tag(content_group[0])
+        yield end_tag(res[0])
+
+    def _bucket_fields_by_lane(self, desc, lanes):
+        """Group fields by the lanes they cover.
+
+        A field spanning several lanes is listed in each of them, so the
+        label pass of a lane only visits the fields that can appear in it.
+        """
+        buckets = [[] for _ in range(lanes)]
+        for e in desc:
+            if 'bits' not in e:
+                continue
+            lsb_lane = e['lsb'] // self.mod
+            msb_lane = e['msb'] // self.mod
+            first = max(min(lsb_lane, msb_lane), 0)
+            last = min(max(lsb_lane, msb_lane), lanes - 1)
+            for lane_index in range(first, last + 1):
+                buckets[lane_index].append(e)
+        return tuple(tuple(bucket) for bucket in buckets)
+
+    def _lane_of(self, row, lanes):
+        # the most significant lane is drawn on top unless hflip is set
+        return row if self.hflip else lanes - row - 1
+
+    def _row(self, line):
+        """Return the drawn row of ``line`` once identical lanes are folded.
+
+        Rows count from the top of the lane window; lines above it map to
+        negative rows.
+        """
+        row_map = self._row_map
+        if row_map is None:
+            return line - self._first_row
+        if line < len(row_map):
+            return row_map[line] - self._first_row
+        return line - len(row_map) + row_map[-1] + 1 - self._first_row
+
+    def _in_window(self, *lines):
+        first, last = self._window
+        return all(first <= line <= last for line in lines)
+
+    def _window_clip(self, element):
+        """Wrap ``element`` in a viewport showing only the rows of the lane window."""
+        first, last = self._window
+        top = self.bit_label_height
+        height = (self.vlane + self.attr_padding) * (self._row(last) + 1)
+        return ['svg', {
+            'x': 0,
+            'y': top,
+            'width': self.hspace,
+            'height': height,
+            'viewBox': ' '.join(str(x) for x in [0, top, self.hspace, height]),
+            'overflow': 'hidden',
+        }, element]
+
+    def _fold_lanes(self, entries, lane_fields, lanes, total_bits, label_lines, arrow_jumps):
+        """Find the rows to replace by an elision marker.
+
+        Rows whose lanes draw alike apart from their bit numbers are grouped
+        into runs; in a run of three or more rows the first is drawn and the
+        rest are returned as a ``(first, last)`` range. Rows referenced by
+        label lines or arrow jumps and lanes crossed by array gaps are never
+        folded.
+        """
+        mod = self.mod
+        pinned = set()
+        for cfg in label_lines:
+            pinned.update((cfg['start_line'], cfg['end_line']))
+        for cfg in arrow_jumps:
+            pinned.update((cfg['start_line'], cfg['jump_to_first'], cfg['jump_to_second']))
+        bit_pos = 0
+        for e in entries:
+            if 'bits' in e:
+                bit_pos += e['bits']
+            elif 'array' in e:
+                length = e['array'][-1] if isinstance(e['array'], list) else e['array']
+                last = (bit_pos + length - 1) // mod if length > 0 else bit_pos // mod
+                for lane in range(bit_pos // mod, min(last, lanes - 1) + 1):
+                    # gaps are drawn at the row of their lane index
+                    pinned.add(lane)
+                    pinned.add(self._lane_of(lane, lanes))
+                bit_pos += length
+
+        skip_count = 0
+        if self.uneven and lanes > 1:
+            skip_count = (mod - total_bits % mod) % mod
+        contents = {}
+
+        def signature(lane):
+            start = lane * mod
+            key = [min(max(total_bits - start, 0), mod),
+                   self.compact and lane == 0,
+                   skip_count if lane == lanes - 1 else 0]
+            for e in lane_fields[lane]:
+                content = contents.get(id(e))
+                if content is None:
+                    content = contents[id(e)] = (
+                        tuple(sorted((k, repr(v)) for k, v in e.items()
+                                     if k not in ('lsb', 'msb', 'lsbm', 'msbm', '_attr_entries'))),
+                        any(item['kind'] == 'bits' for item in e['_attr_entries']))
+                items, attr_bits = content
+                lsb = max(e['lsb'], start)
+                msb = min(e['msb'], start + mod - 1)
+                # bit attributes show the bits of the field that fall in this lane
+                key.append((items, lsb - start, msb - start, e['lsb'] == lsb,
+                            lsb - e['lsb'] if attr_bits else 0))
+            return key
+
+        folds = []
+        run_start = 0
+        run_key = None
+        for row in range(lanes + 1):
+            key = None
+            if row < lanes and row not in pinned:
+                key = signature(self._lane_of(row, lanes))
+            if key is None or key != run_key:
+                if run_key is not None and row - run_start >= 3:
+                    folds.append((run_start + 1, row - 1))
+                run_start = row
+                run_key = key
+        return tuple(folds)
+
+    @staticmethod
+    def _fold_row_map(folds, lanes):
+        fold_ends = dict(folds)
+        row_map = []
+        row = 0
+        line = 0
+        while line < lanes:
+            last = fold_ends.get(line, line)
+            row_map.extend([row] * (last - line + 1))
+            row += 1
+            line = last + 1
+        return tuple(row_map)
+
+    def _validate_label_lines(self, label_lines, lanes):
         required = ['label_lines', 'font_size', 'start_line', 'end_line', 'layout']
-        for cfg in self.label_lines:
+        for cfg in label_lines:
             for key in required:
                 if key not in cfg:
                     raise ValueError('label_lines missing required key: {}'.format(key))
@@ -480,7 +1213,7 @@ class Renderer(object):
                 raise ValueError('label_lines start_line and end_line must be integers')
             if start < 0 or end < 0:
                 raise ValueError('label_lines start_line and end_line must be non-negative')
-            if end >= self.lanes or start >= self.lanes:
+            if end >= lanes or start >= lanes:
                 raise ValueError('label_lines start_line/end_line exceed number of lanes')
             if end - start < 0:
                 raise ValueError('label_lines must cover at least 2 lines')
@@ -492,9 +1225,9 @@ class Renderer(object):
             if 'reserved' in cfg and not isinstance(cfg['reserved'], bool):
                 raise ValueError('label_lines reserved must be a boolean')
 
-    def _validate_arrow_jumps(self):
+    def _validate_arrow_jumps(self, arrow_jumps, lanes):
         required = ['arrow_jump', 'start_line', 'jump_to_first', 'jump_to_second', 'end_bit', 'layout']
-        for cfg in self.arrow_jumps:
+        for cfg in arrow_jumps:
             for key in required:
                 if key not in cfg:
                     raise ValueError('arrow_jump missing required key: {}'.format(key))
@@ -510,7 +1243,7 @@ class Renderer(object):
                     raise ValueError(f'arrow_jump {value_name} must be an integer')
                 if value < 0:
                     raise ValueError(f'arrow_jump {value_name} must be non-negative')
-                if value >= self.lanes:
+                if value >= lanes:
                     raise ValueError('arrow_jump {} exceeds number of lanes'.format(value_name))
             for bit_name in ('arrow_jump', 'end_bit'):
                 bit_value = cfg[bit_name]
@@ -531,8 +1264,9 @@ class Renderer(object):
     def _label_lines_element(self, cfg):
         text = cfg['label_lines']
         font_size = cfg.get('font_size', self.fontsize)
-        start = cfg['start_line']
-        end = cfg['end_line']
+        # a label crossing the edge of the lane window is cut at the edge
+        start = self._row(max(cfg['start_line'], self._window[0]))
+        end = self._row(min(cfg['end_line'], self._window[1]))
         layout = cfg['layout']
         base_y = self.bit_label_height
         if self.legend:
@@ -574,9 +1308,7 @@ class Renderer(object):
         text_attrs = {
             'x': text_x,
             'y': mid_y,
-            'font-size': font_size,
-            'font-family': self.fontfamily,
-            'font-weight': self.fontweight,
+            **self._font(font_size),
             'text-anchor': anchor,
             'dominant-baseline': 'middle'
         }
@@ -639,6 +1371,7 @@ class Renderer(object):
         return step * position
 
     def _line_center_y(self, line, base_y):
+        line = self._row(line)
         return base_y + self.vlane * line + self.attr_padding * line + self.vlane / 2
 
     def _arrow_jump_head_extent(self, stroke_width):
@@ -655,6 +1388,9 @@ class Renderer(object):
         group = ['g', {'class': 'arrow-jumps'}]
 
         for cfg in self.arrow_jumps:
+            # an arrow leaving the lane window would point nowhere
+            if not self._in_window(cfg['start_line'], cfg['jump_to_first'], cfg['jump_to_second']):
+                continue
             stroke_width = cfg.get('stroke_width', 3)
             outer_distance = cfg.get('_outer_distance', 10)
             if cfg['layout'] == 'left':
@@ -695,6 +1431,8 @@ class Renderer(object):
             }]
             group.append(path)
 
+        if len(group) == 2:
+            return None
         return group
 
     def legend_items(self):
@@ -707,15 +1445,13 @@ class Renderer(object):
                 'x': x,
                 'width': 12,
                 'height': 12,
-                'fill': self.type_color(value),
+                **self._fill(value),
                 #'style': 'stroke:#000; stroke-width:' + str(self.stroke_width) + ';' + self.type_style(value)
             }])
             x += square_padding
             items.append(['text', {
                 'x': x,
-                'font-size': self.fontsize,
-                'font-family': self.fontfamily,
-                'font-weight': self.fontweight,
+                **self._font(),
                 'y': self.fontsize / 1.2,
             }, key])
             x += name_padding
@@ -730,18 +1466,26 @@ class Renderer(object):
             if 'bits' in e:
                 bit_pos += e['bits']
                 continue
-            if isinstance(e, dict) and 'array' in e:
+            if 'array' in e:
                 start = bit_pos
                 length = e['array'][-1] if isinstance(e['array'], list) else e['array']
                 end = start + length
                 start_lane = start // self.mod
                 end_lane = (end - 1) // self.mod if end > 0 else 0
+                clip = False
+                if self.lane_range is not None:
+                    if end_lane < self._window[0] or start_lane > self._window[1]:
+                        bit_pos = end
+                        continue
+                    clip = not self._in_window(start_lane, end_lane)
                 x1_raw = (start % self.mod) * step
                 x2_raw = (end % self.mod) * step
                 width = step * e.get('gap_width', 0.5)
                 margin = step * 0.1
-                top_y = base_y + self.vlane * start_lane + self.attr_padding * start_lane
-                bottom_y = base_y + self.vlane * (end_lane + 1) + self.attr_padding * (end_lane + 1)
+                start_row = self._row(start_lane)
+                end_row = self._row(end_lane)
+                top_y = base_y + self.vlane * start_row + self.attr_padding * start_row
+                bottom_y = base_y + self.vlane * (end_row + 1) + self.attr_padding * (end_row + 1)
                 if x2_raw == 0 and end > start:
                     x2_outer = self.hspace - margin
                 else:
@@ -756,21 +1500,27 @@ class Renderer(object):
                     grp_attrs['stroke'] = color
                 grp = ['g', grp_attrs]
                 # fill the full gap bounds to avoid transparent edges
-                background_fill = None
+                background = None
                 if e.get('type') is not None:
-                    background_fill = self.type_color(e['type'])
+                    background = self._fill(e['type'])
                 else:
                     if e.get('fill') is not None:
-                        background_fill = e.get('fill')
+                        background = {'fill': e.get('fill')}
                     elif e.get('gap_fill') is not None:
-                        background_fill = e.get('gap_fill')
-                if background_fill is not None:
+                        background = {'fill': e.get('gap_fill')}
+                if background is not None:
                     # use raw coordinates so the background reaches the lane boundaries
                     overlap = 0.0
                     if end_lane > start_lane:
                         overlap = min(self.vlane * 0.05, 0.5)
-                    for lane_idx in range(start_lane, end_lane + 1):
-                        lane_top = base_y + self.vlane * lane_idx + self.attr_padding * lane_idx
+                    rects = []
+                    first_lane, last_lane = start_lane, end_lane
+                    if self.lane_range is not None:
+                        first_lane = max(first_lane, self._window[0])
+                        last_lane = min(last_lane, self._window[1])
+                    for lane_idx in range(first_lane, last_lane + 1):
+                        row = self._row(lane_idx)
+                        lane_top = base_y + self.vlane * row + self.attr_padding * row
                         lane_bottom = lane_top + self.vlane
                         if overlap:
                             if lane_idx > start_lane:
@@ -784,12 +1534,17 @@ class Renderer(object):
                                 right = self.hspace
                         else:
                             right = self.hspace
-                        rect = f"{left},{lane_top} {right},{lane_top} {right},{lane_bottom} {left},{lane_bottom}"
-                        grp.append(['polygon', {
-                            'points': rect,
-                            'fill': background_fill,
-                            'stroke': 'none'
-                        }])
+                        rects.append((left, lane_top, right, lane_bottom))
+                    if self.coalesce_paths:
+                        grp.append(_rects_path(rects, dict(background, stroke='none')))
+                    else:
+                        for left, lane_top, right, lane_bottom in rects:
+                            rect = f"{left},{lane_top} {right},{lane_top} {right},{lane_bottom} {left},{lane_bottom}"
+                            grp.append(['polygon', {
+                                'points': rect,
+                                **background,
+                                'stroke': 'none'
+                            }])
                 # gap polygon on top, optionally with custom fill
                 gap_fill = e.get('gap_fill', e.get('fill', '#fff'))
                 polygon_attrs = {'points': pts, 'fill': gap_fill}
@@ -816,7 +1571,8 @@ class Renderer(object):
                         )
                         if boundary_segments:
                             hpos = 0 if self.vflip else step * skip_count
-                            lane_top = base_y + self.vlane * lane_idx + self.attr_padding * lane_idx
+                            row = self._row(lane_idx)
+                            lane_top = base_y + self.vlane * row + self.attr_padding * row
                             for seg_start, seg_end in boundary_segments:
                                 if seg_end <= trailing_offset:
                                     continue
@@ -836,22 +1592,32 @@ class Renderer(object):
                                     'vector-effect': 'non-scaling-stroke',
                                 }])
                 if show_lines:
-                    grp.append(['line', {
-                        'x1': x1,
-                        'y1': top_y,
-                        'x2': x2,
-                        'y2': bottom_y,
-                        'stroke': color,
-                        'vector-effect': 'non-scaling-stroke',
-                    }])
-                    grp.append(['line', {
-                        'x1': x1 + width,
-                        'y1': top_y,
-                        'x2': x2_outer,
-                        'y2': bottom_y,
-                        'stroke': color,
-                        'vector-effect': 'non-scaling-stroke',
-                    }])
+                    slants = [
+                        ['line', {
+                            'x1': x1,
+                            'y1': top_y,
+                            'x2': x2,
+                            'y2': bottom_y,
+                            'stroke': color,
+                            'vector-effect': 'non-scaling-stroke',
+                        }],
+                        ['line', {
+                            'x1': x1 + width,
+                            'y1': top_y,
+                            'x2': x2_outer,
+                            'y2': bottom_y,
+                            'stroke': color,
+                            'vector-effect': 'non-scaling-stroke',
+                        }],
+                    ]
+                    if self.coalesce_paths:
+                        grp.append(_lines_path(slants, {
+                            'stroke': color,
+                            'fill': 'none',
+                            'vector-effect': 'non-scaling-stroke',
+                        }))
+                    else:
+                        grp.extend(slants)
                 if 'name' in e:
                     name = str(e['name'])
                     lines = name.split('\n')
@@ -873,9 +1639,7 @@ class Renderer(object):
                     text_color = e.get('font_color', 'black')
                     text_attrs = {
                         'x': label_x,
-                        'font-size': self.fontsize,
-                        'font-family': self.fontfamily,
-                        'font-weight': self.fontweight,
+                        **self._font(),
                         'text-anchor': 'middle',
                         'fill': text_color,
                         'stroke': 'none'
@@ -901,11 +1665,11 @@ class Renderer(object):
                                     span_attrs['y'] = first_line_y + line_height * i
                                 text_element.append(['tspan', span_attrs, span[2]])
                         grp.append(text_element)
-                res.append(grp)
+                res.append(self._window_clip(grp) if clip else grp)
                 bit_pos = end
         return res
 
-    def lane(self, desc):
+    def _row_offset(self):
         if self.compact:
             if self.index > 0:
                 dy = (self.index - 1) * self.vlane + self.vspace
@@ -915,18 +1679,106 @@ class Renderer(object):
             dy = self.index * self.lane_spacing
         if self.legend:
             dy += self.fontsize * 1.2
+        return dy
+
+    def _cage_offset(self):
+        if not self.compact or self.index == 0:
+            return self.bit_label_height
+        return 0
+
+    def lane(self, desc):
         res = ['g', {
-            'transform': t(0, dy)
+            'transform': t(0, self._row_offset())
         }]
-        res.append(self.labels(desc))
+        res.append(self.labels(self.lane_fields[self.lane_index]))
         res.append(self.cage(desc))
         return res
 
+    def fold_marker(self, first, last):
+        """Draw the row standing for the folded rows ``first`` to ``last``."""
+        lanes = (self._lane_of(first, self.lanes), self._lane_of(last, self.lanes))
+        lsb = min(lanes) * self.mod
+        msb = (max(lanes) + 1) * self.mod - 1
+        return ['g', {
+            'class': 'lane-fold',
+            'transform': t(0, self._row_offset() + self._cage_offset())
+        }, ['text', {
+            'x': self.hspace / 2,
+            'y': self.vlane / 2 + self.fontsize / 2,
+            **self._font(),
+            'text-anchor': 'middle',
+        }, '\u2026 bits {}\u2013{} \u2026'.format(lsb, msb)]]
+
+    def _symbol(self, key, element):
+        """Define ``element`` as a symbol for ``key`` and return its ``use``."""
+        if self._format_number is not None:
+            # hash what is emitted, the cage cache stores quantized markup
+            _quantize(element, self._format_number)
+        symbol_id = 'bf-' + cache_key(jsonml_stringify(element), self._symbol_salt)[:12]
+        self._symbol_ids[key] = symbol_id
+        self._new_symbols.append(['symbol', {'id': symbol_id, 'overflow': 'visible'}, element])
+        return ['use', {'xlink:href': '#' + symbol_id}]
+
+    def _cage_key(self, skip_count, draw_bottom, draw_top):
+        """Return what the cage of the current lane depends on.
+
+        Bits are taken relative to the lane start: the lane width, field
+        boundaries and the hidden ranges reaching into the lane.
+        """
+        start = self.lane_index * self.mod
+        end = start + self.mod
+        boundaries = tuple(e['lsb'] - start for e in self.lane_fields[self.lane_index]
+                           if start <= e['lsb'] < end)
+        hidden = ()
+        if self.hidden_array_ranges:
+            lo = max(bisect_left(self._hidden_starts, start) - 1, 0)
+            hi = bisect_right(self._hidden_starts, end)
+            # clipped one bit beyond the lane: the lane edges are hidden
+            # only by ranges strictly containing them
+            hidden = tuple((max(s, start - 1) - start, min(e, end + 1) - start)
+                           for s, e in self.hidden_array_ranges[lo:hi] if e > start - 1)
+        return ('cage', self._cage_offset(), skip_count, min(max(self.total_bits - start, 0), self.mod),
+                draw_bottom, draw_top, boundaries, hidden)
+
     def cage(self, desc):
-        if not self.compact or self.index == 0:
-            dy = self.bit_label_height
+        skip_count = 0
+        if self.uneven and self.lanes > 1 and self.lane_index == self.lanes - 1:
+            skip_count = self.mod - self.total_bits % self.mod
+            if skip_count == self.mod:
+                skip_count = 0
+        draw_bottom = not self.compact or self.hflip or self.lane_index == 0 or self._fold_below
+        draw_top = not self.compact or not self.hflip or self.lane_index == 0 or self._fold_above
+        if not (self.use_symbols or self.cage_cache):
+            return self._cage(skip_count, draw_bottom, draw_top)
+        key = self._cage_key(skip_count, draw_bottom, draw_top)
+        if self.use_symbols:
+            symbol_id = self._symbol_ids.get(key)
+            if symbol_id is not None:
+                return ['use', {'xlink:href': '#' + symbol_id}]
+        if self.cage_cache:
+            cage = self._cached_cage(key, skip_count, draw_bottom, draw_top)
         else:
-            dy = 0
+            cage = self._cage(skip_count, draw_bottom, draw_top)
+        if self.use_symbols:
+            return self._symbol(key, cage)
+        return cage
+
+    def _cached_cage(self, key, skip_count, draw_bottom, draw_top):
+        """Return the serialized cage of the current lane from the shared cache."""
+        # everything else the cage depends on is part of the lane key
+        key = (self.hspace, self.mod, self.vlane, self.stroke_width, self.vflip,
+               self.grid_draw, self.coalesce_paths, self.precision) + key
+        fragment = _CAGE_CACHE.get(key)
+        if fragment is None:
+            cage = self._cage(skip_count, draw_bottom, draw_top)
+            if self._format_number is not None:
+                _quantize(cage, self._format_number)
+            fragment = Markup(jsonml_stringify(cage))
+            _CAGE_CACHE.put(key, fragment)
+        return fragment
+
+    def _cage(self, skip_count, draw_bottom, draw_top):
+        dy = self._cage_offset()
         res = ['g', {
             'stroke': 'black',
             'stroke-width': self.stroke_width,
@@ -934,36 +1786,32 @@ class Renderer(object):
             'transform': t(0, dy)
         }]
 
-        skip_count = 0
-        if self.uneven and self.lanes > 1 and self.lane_index == self.lanes - 1:
-            skip_count = self.mod - self.total_bits % self.mod
-            if skip_count == self.mod:
-                skip_count = 0
-
+        # lines are collected so they can be merged into one path
+        lines = []
         lane_start_bit = self.lane_index * self.mod
         lane_width_bits = self.mod - skip_count
         step = self.hspace / self.mod
         hpos = 0 if self.vflip else step * skip_count
 
         bottom_boundary = lane_start_bit + lane_width_bits
-        if not self.compact or self.hflip or self.lane_index == 0:
+        if draw_bottom:
             segments = self._boundary_segments(lane_start_bit, lane_width_bits, bottom_boundary)
             for start_bits, end_bits in segments:
                 length_bits = end_bits - start_bits
                 if length_bits <= 0:
                     continue
                 x = hpos + start_bits * step
-                res.append(self.hline(length_bits * step, x, self.vlane))  # bottom
+                lines.append(self.hline(length_bits * step, x, self.vlane))  # bottom
 
         top_boundary = lane_start_bit
-        if not self.compact or not self.hflip or self.lane_index == 0:
+        if draw_top:
             segments = self._boundary_segments(lane_start_bit, lane_width_bits, top_boundary)
             for start_bits, end_bits in segments:
                 length_bits = end_bits - start_bits
                 if length_bits <= 0:
                     continue
                 x = hpos + start_bits * step
-                res.append(self.hline(length_bits * step, x))  # top
+                lines.append(self.hline(length_bits * step, x))  # top
 
         hbit = (self.hspace - self.stroke_width) / self.mod
         for bit_pos in range(self.mod):
@@ -974,61 +1822,66 @@ class Renderer(object):
             rpos = bit_pos + 1 if self.vflip else bit_pos
             lpos = bit_pos if self.vflip else bit_pos + 1
             if bitm + 1 == self.mod - skip_count:
-                res.append(self.vline(self.vlane, rpos * hbit + self.stroke_width / 2))
+                lines.append(self.vline(self.vlane, rpos * hbit + self.stroke_width / 2))
             if bitm == 0:
-                res.append(self.vline(self.vlane, lpos * hbit + self.stroke_width / 2))
-            elif any('lsb' in e and e['lsb'] == bit for e in desc):
-                res.append(self.vline(self.vlane, lpos * hbit + self.stroke_width / 2))
+                lines.append(self.vline(self.vlane, lpos * hbit + self.stroke_width / 2))
+            elif bit in self.field_boundaries:
+                lines.append(self.vline(self.vlane, lpos * hbit + self.stroke_width / 2))
             else:
                 if self.grid_draw and not self._bit_hidden(bit):
-                    res.append(self.vline((self.vlane / 8),
-                                          lpos * hbit + self.stroke_width / 2))
-                    res.append(self.vline((self.vlane / 8),
-                                          lpos * hbit + self.stroke_width / 2, self.vlane * 7 / 8))
+                    lines.append(self.vline((self.vlane / 8),
+                                            lpos * hbit + self.stroke_width / 2))
+                    lines.append(self.vline((self.vlane / 8),
+                                            lpos * hbit + self.stroke_width / 2, self.vlane * 7 / 8))
 
+        if self.coalesce_paths:
+            res.append(_lines_path(lines, {'fill': 'none', 'vector-effect': 'non-scaling-stroke'}))
+        else:
+            res.extend(lines)
         return res
 
+    def _hidden_range_at(self, bit_pos):
+        """Return the hidden array range strictly containing ``bit_pos``.
+
+        Array gaps are laid out back to back, so the hidden ranges are sorted
+        and never overlap; a bisect on the range starts finds the only
+        candidate.
+        """
+        starts = getattr(self, '_hidden_starts', None)
+        if not starts:
+            return None
+        i = bisect_left(starts, bit_pos) - 1
+        if i < 0:
+            return None
+        start, end = self.hidden_array_ranges[i]
+        if start < bit_pos < end:
+            return start, end
+        return None
+
     def _boundary_segments(self, lane_start_bit, lane_width_bits, boundary_bit):
         if lane_width_bits <= 0:
             return []
 
         lane_end_bit = lane_start_bit + lane_width_bits
-        overlaps = []
-        for start, end in getattr(self, 'hidden_array_ranges', []):
-            if start < boundary_bit < end:
-                overlap_start = max(start, lane_start_bit)
-                overlap_end = min(end, lane_end_bit)
-                if overlap_start < overlap_end:
-                    overlaps.append((overlap_start, overlap_end))
-
-        if not overlaps:
+        hidden = self._hidden_range_at(boundary_bit)
+        if hidden is None:
             return [(0, lane_width_bits)]
 
-        overlaps.sort()
-        merged = []
-        for start, end in overlaps:
-            if not merged or start > merged[-1][1]:
-                merged.append([start, end])
-            else:
-                merged[-1][1] = max(merged[-1][1], end)
+        start, end = hidden
+        overlap_start = max(start, lane_start_bit)
+        overlap_end = min(end, lane_end_bit)
+        if overlap_start >= overlap_end:
+            return [(0, lane_width_bits)]
 
         segments = []
-        cursor = lane_start_bit
-        for start, end in merged:
-            if start > cursor:
-                segments.append((cursor - lane_start_bit, start - lane_start_bit))
-            cursor = max(cursor, end)
-
-        if cursor < lane_end_bit:
-            segments.append((cursor - lane_start_bit, lane_end_bit - lane_start_bit))
-
+        if overlap_start > lane_start_bit:
+            segments.append((0, overlap_start - lane_start_bit))
+        if overlap_end < lane_end_bit:
+            segments.append((overlap_end - lane_start_bit, lane_width_bits))
         return segments
 
     def _bit_hidden(self, bit_pos):
-        for start, end in getattr(self, 'hidden_array_ranges', []):
-            if start < bit_pos < end:
-                return True
-        return False
+        return self._hidden_range_at(bit_pos) is not None
 
     @staticmethod
     def _is_numeric_angle(value):
@@ -1134,9 +1987,7 @@ class Renderer(object):
                 text_attrs = {
                     'x': step * bit_pos,
                     'y': entry['y'],
-                    'font-size': self.fontsize,
-                    'font-family': self.fontfamily,
-                    'font-weight': self.fontweight,
+                    **self._font(),
                 }
                 nodes.append(['text', text_attrs] + tspan(bit_text))
             return nodes
@@ -1149,9 +2000,7 @@ class Renderer(object):
             text_attrs = {
                 'x': center_x,
                 'y': center_y,
-                'font-size': self.fontsize,
-                'font-family': self.fontfamily,
-                'font-weight': self.fontweight,
+                **self._font(),
                 'text-anchor': 'middle',
                 'dominant-baseline': 'middle',
                 'transform': 'rotate({},{},{})'.format(angle, center_x, center_y),
@@ -1162,9 +2011,7 @@ class Renderer(object):
             text_attrs = {
                 'x': step * (msb_pos + lsb_pos) / 2,
                 'y': entry['y'],
-                'font-size': self.fontsize,
-                'font-family': self.fontfamily,
-                'font-weight': self.fontweight,
+                **self._font(),
             }
             return [['text', text_attrs] + tspan(entry['text'])]
 
@@ -1180,7 +2027,7 @@ class Renderer(object):
             bits = ['g', {'transform': t(step / 2, self.fontsize)}]
         names = ['g', {'transform': t(step / 2, self.vlane / 2 + self.fontsize / 2)}]
         attrs = ['g', {'transform': t(step / 2, self.vlane)}]
-        blanks = ['g', {'transform': t(0, 0)}]
+        blank_rects = []
 
         for e in desc:
             if 'bits' not in e:
@@ -1206,22 +2053,16 @@ class Renderer(object):
             if self.number_draw and not self.compact:
                 bits.append(['text', {
                     'x': step * lsb_pos,
-                    'font-size': self.fontsize,
-                    'font-family': self.fontfamily,
-                    'font-weight': self.fontweight
+                    **self._font()
                 }, str(lsb)])
                 if lsbm != msbm:
                     bits.append(['text', {
                         'x': step * msb_pos,
-                        'font-size': self.fontsize,
-                        'font-family': self.fontfamily,
-                        'font-weight': self.fontweight
+                        **self._font()
                     }, str(msb)])
             if 'name' in e:
                 ltextattrs = {
-                    'font-size': self.fontsize,
-                    'font-family': self.fontfamily,
-                    'font-weight': self.fontweight,
+                    **self._font(),
                     'text-anchor': 'middle',
                     'y': 6
                 }
@@ -1258,17 +2099,9 @@ class Renderer(object):
                 }, text_group]
                 names.append(ltext)
             if 'name' not in e or e['type'] is not None:
-                style = self.type_style(e['type'])
-                blanks.append(['rect', {
-                    #'style': style,
-                    'x': step * (lsb_pos if self.vflip else msb_pos),
-                    'y': self.stroke_width / 2,
-                    'width': step * (msbm - lsbm + 1),
-                    'height': self.vlane - self.stroke_width / 2,
-                    'fill': self.type_color(e['type']),
-                }])
+                blank_rects.append((lsb_pos if self.vflip else msb_pos, msbm - lsbm + 1, e['type']))
             if not self.compact:
-                attr_entries = e.get('_attr_entries', [])
+                attr_entries = e.get('_attr_entries', ())
                 if attr_entries:
                     attr_offset = 0
                     for entry in attr_entries:
@@ -1278,6 +2111,7 @@ class Renderer(object):
                                 'transform': t(0, attr_offset)
                             }, *rendered])
                         attr_offset += entry['spacing']
+        blanks = self._blanks(blank_rects)
         if not self.compact or (self.index == 0):
             lane_children = []
             if self.number_draw:
@@ -1285,9 +2119,7 @@ class Renderer(object):
                     for i in range(self.mod):
                         bits.append(['text', {
                             'x': step * i,
-                            'font-size': self.fontsize,
-                            'font-family': self.fontfamily,
-                            'font-weight': self.fontweight,
+                            **self._font(),
                         }, str(i if self.vflip else self.mod - i - 1)])
                 lane_children.append(bits)
             content_attrs = {}
@@ -1299,6 +2131,27 @@ class Renderer(object):
             res = ['g', {}, blanks, names, attrs]
         return res
 
+    def _blanks(self, rects):
+        """Return the layer of type-coloured rects of one lane."""
+        if self.use_symbols and rects:
+            key = ('blanks', repr(rects))
+            symbol_id = self._symbol_ids.get(key)
+            if symbol_id is not None:
+                return ['use', {'xlink:href': '#' + symbol_id}]
+        step = self.hspace / self.mod
+        blanks = ['g', {'transform': t(0, 0)}]
+        for pos, width, value in rects:
+            blanks.append(['rect', {
+                'x': step * pos,
+                'y': self.stroke_width / 2,
+                'width': step * width,
+                'height': self.vlane - self.stroke_width / 2,
+                **self._fill(value),
+            }])
+        if self.use_symbols and rects:
+            return self._symbol(key, blanks)
+        return blanks
+
     def hline(self, length, x=0, y=0, padding=0):
         res = ['line']
         if padding != 0:
@@ -1352,6 +2205,74 @@ class Renderer(object):
         return '\n'.join(trimmed_lines)
 
 
+def compile_layout(desc, **kwargs):
+    return Renderer(**kwargs).compile(desc)
+
+
+def _plan_key(plan):
+    return cache_key([plan.entries, plan.label_lines, plan.arrow_jumps], plan.options)
+
+
+def _renderer_for(desc, kwargs):
+    if isinstance(desc, LayoutPlan):
+        if kwargs:
+            raise TypeError('render() options are fixed by compile_layout() when given a LayoutPlan')
+        kwargs = desc.options
+    return Renderer(**kwargs)
+
+
 def render(desc, **kwargs):
-    renderer = Renderer(**kwargs)
+    renderer = _renderer_for(desc, kwargs)
     return renderer.render(desc)
+
+
+def _render_key(desc, renderer, indent=None):
+    if isinstance(desc, LayoutPlan):
+        key = _plan_key(desc)
+    else:
+        key = cache_key(desc, renderer.options)
+    if indent is not None:
+        key = cache_key([key, indent], None)
+    return key
+
+
+def render_key(desc, indent=None, **kwargs):
+    """Return the cache key :func:`render_svg` uses for ``desc`` and options."""
+    return _render_key(desc, _renderer_for(desc, kwargs), indent)
+
+
+def render_svg(desc, cache=None, indent=None, **kwargs):
+    """Render ``desc`` and return the serialized SVG document.
+
+    ``cache`` is an optional :class:`~bit_field.cache.RenderCache` or
+    :class:`~bit_field.cache.DiskCache`; it is consulted by content hash of
+    the descriptor and all renderer options before rendering, and filled
+    afterwards. ``indent`` pretty-prints the document, see
+    :func:`~bit_field.jsonml_stringify.jsonml_stringify`.
+    """
+    renderer = _renderer_for(desc, kwargs)
+    if cache is None:
+        return jsonml_stringify(renderer.render(desc), indent)
+    key = _render_key(desc, renderer, indent)
+    svg = cache.get(key)
+    if svg is None:
+        svg = jsonml_stringify(renderer.render(desc), indent)
+        cache.put(key, svg)
+    return svg
+
+
+def iter_svg(desc, **kwargs):
+    """Render ``desc`` to SVG, yielding the document in string chunks."""
+    renderer = _renderer_for(desc, kwargs)
+    return renderer.iter_svg(desc)
+
+
+def render_to(desc, fileobj, **kwargs):
+    """Render ``desc`` to SVG and write it to ``fileobj`` as it is produced.
+
+    ``fileobj`` may be a text or a binary file; binary files receive UTF-8.
+    """
+    binary = isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(fileobj, 'mode', '')
+    write = fileobj.write
+    for chunk in iter_svg(desc, **kwargs):
+        write(chunk.encode('utf-8') if binary else chunk)
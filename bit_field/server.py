@@ -0,0 +1,260 @@
+import http.client
+import json
+import os
+import socket
+import socketserver
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .batch import split_document
+from .cache import DiskCache, RenderCache
+from .render import render_key, render_svg
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8737
+DEFAULT_URL = 'http://{}:{}'.format(DEFAULT_HOST, DEFAULT_PORT)
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def _describe(exc):
+    return '{}: {}'.format(type(exc).__name__, exc)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """Serve ``POST /render`` requests.
+
+    The request body is an input document: a descriptor list, or
+    ``{"config": {...}, "payload": [...]}`` to pass renderer options. The
+    response is the SVG document, or a plain text error message.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'bit_field'
+    # idle keep-alive connections are dropped after this many seconds
+    timeout = 30
+    # headers and body are written separately; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.log is not None:
+            self.server.log.write('{} {}\n'.format(self.address_string(), format % args))
+
+    def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._reply(404, 'not found\n')
+            return
+        self._reply(200, 'ok\n')
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.close_connection = True
+            self._reply(404, 'not found\n')
+            return
+        try:
+            length = int(self.headers['Content-Length'])
+            if length < 0:
+                raise ValueError(length)
+        except (TypeError, ValueError):
+            self.close_connection = True
+            self._reply(411, 'Content-Length required\n')
+            return
+        if length > self.server.max_request_size:
+            # the body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self._reply(413, 'request larger than {} bytes\n'.format(self.server.max_request_size))
+            return
+        body = self.rfile.read(length)
+        try:
+            desc, options = split_document(json.loads(body))
+            svg = self.server.render(desc, options)
+        except Exception as exc:
+            self._reply(400, _describe(exc) + '\n')
+            return
+        self._reply(200, svg, 'image/svg+xml')
+
+
+class _UnixRenderHandler(RenderHandler):
+    disable_nagle_algorithm = False
+
+
+class _RenderServerMixin(object):
+    daemon_threads = True
+
+    def setup_renderer(self, jobs, max_request_size, cache, log):
+        self.max_request_size = max_request_size
+        self.cache = cache
+        self.log = log
+        self.pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+    def render(self, desc, options):
+        # cache lookups stay in this process; only misses go to the pool
+        key = None
+        if self.cache is not None:
+            key = render_key(desc, **options)
+            svg = self.cache.get(key)
+            if svg is not None:
+                return svg
+        if self.pool is None:
+            svg = render_svg(desc, **options)
+        else:
+            svg = self.pool.submit(render_svg, desc, **options).result()
+        if key is not None:
+            self.cache.put(key, svg)
+        return svg
+
+    def server_close(self):
+        super().server_close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class RenderServer(_RenderServerMixin, ThreadingHTTPServer):
+    """Threaded HTTP render server on a TCP address."""
+
+
+class UnixRenderServer(_RenderServerMixin, socketserver.ThreadingUnixStreamServer):
+    """Threaded HTTP render server on a Unix domain socket."""
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def make_server(address=(DEFAULT_HOST, DEFAULT_PORT), jobs=None, max_request_size=MAX_REQUEST_SIZE,
+                cache=None, log=None):
+    """Create a render server.
+
+    ``address`` is a ``(host, port)`` pair or the path of a Unix socket.
+    Renders run on ``jobs`` worker processes (default: one per CPU; ``jobs=1``
+    renders in the request thread). Bodies above ``max_request_size`` bytes
+    are rejected. ``cache`` defaults to an in-memory :class:`RenderCache`.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if isinstance(address, (str, os.PathLike)):
+        address = os.fspath(address)
+        if os.path.exists(address):
+            # a stale socket from a previous run blocks the bind
+            os.unlink(address)
+        server = UnixRenderServer(address, _UnixRenderHandler)
+    else:
+        server = RenderServer(address, RenderHandler)
+    server.setup_renderer(jobs, max_request_size, RenderCache() if cache is None else cache, log)
+    return server
+
+
+def serve(address=(DEFAULT_HOST, DEFAULT_PORT), **kwargs):
+    """Run a render server until interrupted."""
+    with make_server(address, **kwargs) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RenderClient(object):
+    """Client for a render server that keeps its connection alive.
+
+    ``url`` is ``http://host:port`` or ``unix:/path/to/socket``. Errors
+    reaching the server raise :class:`OSError`; documents the server could
+    not render raise :class:`ValueError` with its message.
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.url.startswith('unix:'):
+            return _UnixHTTPConnection(self.url[len('unix:'):], self.timeout)
+        parts = urlsplit(self.url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError('unsupported server URL {!r}'.format(self.url))
+        return http.client.HTTPConnection(parts.hostname, parts.port or DEFAULT_PORT,
+                                          timeout=self.timeout)
+
+    def _request(self, body):
+        if self._connection is None:
+            self._connection = self._connect()
+        self._connection.request('POST', '/render', body, {'Content-Type': 'application/json'})
+        response = self._connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+
+    def render(self, desc, **options):
+        """Render ``desc`` on the server and return the SVG document."""
+        body = json.dumps({'config': options, 'payload': desc}).encode('utf-8')
+        try:
+            status, text = self._request(body)
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # the server closed an idle keep-alive connection; retry once
+            self.close()
+            status, text = self._request(body)
+        except http.client.HTTPException as exc:
+            self.close()
+            raise OSError(_describe(exc))
+        if status != 200:
+            raise ValueError(text.strip())
+        return text
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser('bitfield serve')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', default=DEFAULT_PORT, type=int)
+    parser.add_argument('--socket', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--jobs', help='number of rendering processes (default: one per CPU)', type=int)
+    parser.add_argument('--max-request-size', help='largest accepted request in bytes',
+                        default=MAX_REQUEST_SIZE, type=int)
+    parser.add_argument('--cache-dir', default=os.environ.get('BITFIELD_CACHE_DIR'),
+                        help='persistent render cache directory (default: $BITFIELD_CACHE_DIR)')
+    parser.add_argument('--cache-size', help='render cache size limit in MiB', default=512, type=int)
+    parser.add_argument('--verbose', help='log requests on stderr', action='store_true')
+    return parser
+
+
+def serve_cli(argv):
+    args = build_parser().parse_args(argv)
+    address = args.socket if args.socket else (args.host, args.port)
+    cache = None
+    if args.cache_dir:
+        cache = DiskCache(args.cache_dir, max_size=args.cache_size * 2**20)
+    serve(address, jobs=args.jobs, max_request_size=args.max_request_size, cache=cache,
+          log=sys.stderr if args.verbose else None)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import bit_field
+from .. import aio
+from .. import RenderCache, render_many, render_svg
+
+
+REG = [
+    {"name": "head", "bits": 5, "attr": "RO"},
+    {"array": 12, "name": "gap", "type": 3},
+    {"name": "tail", "bits": 20},
+]
+
+
+def test_render_async_matches_render_svg():
+    async def main():
+        return (await bit_field.render_async(REG, bits=8, marker_namespace='aio'),
+                await bit_field.render_async(REG, bits=8, marker_namespace='aio', indent=2))
+
+    plain, pretty = asyncio.run(main())
+
+    assert plain == render_svg(REG, bits=8, marker_namespace='aio')
+    assert pretty == render_svg(REG, bits=8, marker_namespace='aio', indent=2)
+
+
+def test_render_async_on_process_pool_with_cache():
+    cache = RenderCache()
+
+    async def main(executor):
+        first = await aio.render_async(REG, executor=executor, cache=cache, marker_namespace='p')
+        second = await aio.render_async(REG, executor=executor, cache=cache, marker_namespace='p')
+        return first, second
+
+    with ProcessPoolExecutor(1) as executor:
+        first, second = asyncio.run(main(executor))
+
+    assert first == second == render_svg(REG, marker_namespace='p')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_render_async_rejects_bad_options():
+    with pytest.raises(ValueError):
+        asyncio.run(aio.render_async(REG, bits=2))
+
+
+def test_semaphore_limits_concurrent_renders(monkeypatch):
+    lock = threading.Lock()
+    running = [0, 0]
+    render_until = aio._render_until
+
+    def counting(*args):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        try:
+            return render_until(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(aio, '_render_until', counting)
+
+    async def main():
+        semaphore = asyncio.Semaphore(2)
+        with ThreadPoolExecutor(6) as executor:
+            return await asyncio.gather(*(
+                aio.render_async(REG, executor=executor, semaphore=semaphore) for _ in range(6)))
+
+    assert len(asyncio.run(main())) == 6
+    assert running[1] == 2
+
+
+def test_cancelled_render_stops_between_lanes(monkeypatch):
+    outcome = []
+    render_until = aio._render_until
+    monkeypatch.setattr(aio, '_render_until', lambda *args: outcome.append(render_until(*args)))
+    huge = [{"name": str(i), "bits": 32} for i in range(20000)]
+
+    async def main(executor):
+        task = asyncio.ensure_future(aio.render_async(huge, executor=executor))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    executor = ThreadPoolExecutor(1)
+    start = time.perf_counter()
+    asyncio.run(main(executor))
+    executor.shutdown(wait=True)
+
+    assert outcome == [None]
+    assert time.perf_counter() - start < 1
+
+
+def test_iter_render_many_async_matches_render_many():
+    regs = [[{"name": str(i), "bits": 4 + i}] for i in range(10)]
+    regs[3] = [{"name": "bad", "bits": 4, "array": "x"}]
+    regs[5] = {"config": {"bits": 8}, "payload": regs[5]}
+    expected = render_many(regs, jobs=1, bits=16, marker_namespace='many')
+
+    async def collect(descs, **kwargs):
+        return [result async for result in aio.iter_render_many_async(
+            descs, bits=16, marker_namespace='many', **kwargs)]
+
+    async def agen():
+        for reg in regs:
+            yield reg
+
+    ordered = asyncio.run(collect(regs, limit=3))
+    unordered = asyncio.run(collect(agen(), ordered=False))
+
+    assert [(r.index, r.svg, r.error) for r in ordered] == \
+        [(r.index, r.svg, r.error) for r in expected]
+    assert ordered[3].error is not None
+    assert sorted((r.index, r.svg) for r in unordered) == [(r.index, r.svg) for r in expected]
+
+
+def test_iter_render_many_async_applies_backpressure():
+    pulled = []
+
+    def descs():
+        for i in range(100):
+            pulled.append(i)
+            yield [{"name": str(i), "bits": 8}]
+
+    async def main():
+        results = aio.iter_render_many_async(descs(), limit=4)
+        first = await results.__anext__()
+        await asyncio.sleep(0.05)
+        seen = len(pulled)
+        await results.aclose()
+        return first, seen
+
+    first, seen = asyncio.run(main())
+
+    assert first.index == 0 and first.svg
+    assert seen <= 5
@@ -18,12 +18,13 @@ def test_array_polygon_type():
         {'name': 'rest', 'bits': 8},
     ]
     renderer = Renderer(bits=16)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
     svg = jsonml_stringify(jsonml)
     assert '<polygon' in svg
     assert f'stroke="{typeColor(4)}"' in svg
     assert 'gap' in svg
-    assert renderer.lanes == 2
+    assert plan.lanes == 2
 
     def collect_polygons(node, polys):
         if isinstance(node, list):
@@ -44,7 +45,7 @@ def test_array_polygon_type():
     bottom_y = coords[2][1]
     base_y = renderer.fontsize * 1.2
     assert top_y == pytest.approx(base_y)
-    assert bottom_y == pytest.approx(base_y + renderer.vlane)
+    assert bottom_y == pytest.approx(base_y + plan.vlane)
     step = renderer.hspace / renderer.mod
     margin = step * 0.1
     x1 = coords[0][0]
@@ -57,7 +58,7 @@ def test_array_polygon_type():
     c_top = c_coords[0][1]
     c_bottom = c_coords[2][1]
     assert c_top == pytest.approx(base_y)
-    assert c_bottom == pytest.approx(base_y + renderer.vlane)
+    assert c_bottom == pytest.approx(base_y + plan.vlane)
     c_x1 = c_coords[0][0]
     c_x2 = c_coords[2][0]
     assert c_x1 == pytest.approx(step * 8)
@@ -125,7 +126,8 @@ def test_array_gap_fill_covers_full_lanes_for_partial_multiples():
         {'name': 'dolores', 'bits': 16, 'type': 1},
     ]
     renderer = Renderer(bits=32)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
 
     def collect_polygons(node, polys):
         if isinstance(node, list):
@@ -152,9 +154,9 @@ def test_array_gap_fill_covers_full_lanes_for_partial_multiples():
         coords = [tuple(map(float, point.split(','))) for point in poly['points'].split()]
         ys = [y for _, y in coords]
         center = (min(ys) + max(ys)) / 2
-        if center == pytest.approx(base_y + renderer.vlane * 3 + renderer.attr_padding * 3 + renderer.vlane / 2, abs=0.5):
+        if center == pytest.approx(base_y + plan.vlane * 3 + plan.attr_padding * 3 + plan.vlane / 2, abs=0.5):
             lane3_coords = coords
-        elif center == pytest.approx(base_y + renderer.vlane * 4 + renderer.attr_padding * 4 + renderer.vlane / 2, abs=0.5):
+        elif center == pytest.approx(base_y + plan.vlane * 4 + plan.attr_padding * 4 + plan.vlane / 2, abs=0.5):
             lane4_coords = coords
 
     assert lane3_coords is not None
@@ -229,7 +231,8 @@ def test_array_text_aligns_to_first_lane_when_partial():
         {'name': 'dolores', 'bits': 16, 'type': 1},
     ]
     renderer = Renderer(bits=32)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
 
     def collect_texts(node, texts):
         if isinstance(node, list):
@@ -244,7 +247,7 @@ def test_array_text_aligns_to_first_lane_when_partial():
 
     base_y = renderer.fontsize * 1.2
     start_lane = 96 // renderer.mod
-    first_lane_center = renderer._line_center_y(start_lane, base_y)
+    first_lane_center = renderer._context(plan)._line_center_y(start_lane, base_y)
     expected_y = first_lane_center + renderer.fontsize / 2
     assert float(gap_text['y']) == pytest.approx(expected_y)
 
@@ -264,7 +267,8 @@ def test_array_gap_hide_lines_background_rectangles_overlap():
         {'name': 'dolores', 'bits': 16, 'type': 1},
     ]
     renderer = Renderer(bits=32)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
 
     def collect_backgrounds(node, polys):
         if isinstance(node, list):
@@ -292,7 +296,7 @@ def test_array_gap_hide_lines_background_rectangles_overlap():
     first_bottom = max(y for _, y in first)
     second_top = min(y for _, y in second)
 
-    expected_overlap = min(renderer.vlane * 0.05, 0.5) * 2
+    expected_overlap = min(plan.vlane * 0.05, 0.5) * 2
     assert first_bottom - second_top >= expected_overlap - 1e-6
 
 def test_array_text_stays_centered_for_full_lane_multiples():
@@ -304,7 +308,8 @@ def test_array_text_stays_centered_for_full_lane_multiples():
         {'name': 'dolores', 'bits': 16, 'type': 1},
     ]
     renderer = Renderer(bits=32)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
 
     def collect_texts(node, texts):
         if isinstance(node, list):
@@ -320,8 +325,8 @@ def test_array_text_stays_centered_for_full_lane_multiples():
     base_y = renderer.fontsize * 1.2
     start_lane = 96 // renderer.mod
     lane_span = 64 // renderer.mod
-    start_top = base_y + renderer.vlane * start_lane + renderer.attr_padding * start_lane
-    end_bottom = base_y + renderer.vlane * (start_lane + lane_span) + renderer.attr_padding * (start_lane + lane_span)
+    start_top = base_y + plan.vlane * start_lane + plan.attr_padding * start_lane
+    end_bottom = base_y + plan.vlane * (start_lane + lane_span) + plan.attr_padding * (start_lane + lane_span)
     center_y = (start_top + end_bottom) / 2
     expected_y = center_y + renderer.fontsize / 2
     assert float(gap_text['y']) == pytest.approx(expected_y)
@@ -473,7 +478,8 @@ def test_array_hide_lines_restores_top_line_for_trailing_field():
     ]
 
     renderer = Renderer(bits=32)
-    jsonml = renderer.render(reg)
+    plan = renderer.compile(reg)
+    jsonml = renderer.render(plan)
 
     step = renderer.hspace / renderer.mod
     base_y = renderer.fontsize * 1.2
@@ -495,15 +501,15 @@ def test_array_hide_lines_restores_top_line_for_trailing_field():
     assert trailing_offset != 0
 
     skip_count = 0
-    if renderer.uneven and renderer.lanes > 1 and end_lane == renderer.lanes - 1:
-        skip_count = renderer.mod - renderer.total_bits % renderer.mod
+    if renderer.uneven and plan.lanes > 1 and end_lane == plan.lanes - 1:
+        skip_count = renderer.mod - plan.total_bits % renderer.mod
         if skip_count == renderer.mod:
             skip_count = 0
 
     lane_left = 0 if renderer.vflip else step * skip_count
     lane_right = lane_left + (renderer.mod - skip_count) * step
     expected_start = lane_left + trailing_offset * step
-    expected_y = base_y + renderer.vlane * end_lane + renderer.attr_padding * end_lane
+    expected_y = base_y + plan.vlane * end_lane + plan.attr_padding * end_lane
 
     lines = []
 
@@ -526,3 +532,24 @@ def test_array_hide_lines_restores_top_line_for_trailing_field():
     ]
 
     assert matching
+
+
+def test_adjacent_hidden_arrays_keep_shared_boundary_visible():
+    reg = [
+        {'name': 'head', 'bits': 4},
+        {'array': 6, 'hide_lines': True},
+        {'array': 6, 'hide_lines': True},
+        {'name': 'tail', 'bits': 16},
+    ]
+    renderer = Renderer(bits=16)
+    plan = renderer.compile(reg)
+    context = renderer._context(plan)
+
+    assert plan.hidden_array_ranges == ((4, 10), (10, 16))
+    assert context._bit_hidden(5)
+    assert not context._bit_hidden(10)
+    assert context._bit_hidden(15)
+    assert not context._bit_hidden(16)
+    assert context._boundary_segments(0, 16, 8) == [(0, 4), (10, 16)]
+    assert context._boundary_segments(0, 16, 10) == [(0, 16)]
+    assert context._boundary_segments(16, 16, 16) == [(0, 16)]
@@ -0,0 +1,67 @@
+import pytest
+from .. import RenderCache, render_many, iter_render_many, render_pages, render_svg
+
+
+def _regs(count):
+    return [[{"name": "r{}".format(i), "bits": 8}, {"bits": i % 8 + 1}] for i in range(count)]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_render_many_keeps_input_order(jobs):
+    regs = _regs(7)
+
+    results = render_many(regs, jobs=jobs, chunksize=2, bits=8, marker_namespace='m')
+
+    assert [r.index for r in results] == list(range(7))
+    assert all(r.error is None for r in results)
+    assert [r.svg for r in results] == [render_svg(reg, bits=8, marker_namespace='m') for reg in regs]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_render_many_captures_errors(jobs):
+    regs = _regs(3)
+    regs.insert(1, [{"bits": 8}, {"label_lines": "x", "layout": "left"}])
+
+    results = render_many(regs, jobs=jobs, chunksize=3, bits=8)
+
+    assert [r.error is None for r in results] == [True, False, True, True]
+    assert results[1].svg is None
+    assert results[1].error.startswith('ValueError: label_lines missing required key')
+
+
+def test_iter_render_many_unordered_yields_everything():
+    results = list(iter_render_many(_regs(9), jobs=2, chunksize=2, ordered=False, bits=8))
+
+    assert sorted(r.index for r in results) == list(range(9))
+
+
+def test_render_many_rejects_bad_options():
+    with pytest.raises(ValueError):
+        render_many(_regs(2), jobs=1, bits=2)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_render_pages_splits_by_height(jobs):
+    reg = [{"name": "r{}".format(i), "bits": 8} for i in range(40)]
+
+    pages = render_pages(reg, 300, jobs=jobs, bits=16, marker_namespace='p')
+
+    assert len(pages) == 7
+    assert pages == [render_svg(reg, bits=16, marker_namespace='p', lane_range=(first, min(first + 2, 19)))
+                     for first in range(0, 20, 3)]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_render_many_uses_cache_in_parent(jobs):
+    regs = _regs(5)
+    regs[2] = [{"bits": 8}, {"label_lines": "x", "layout": "left"}]
+    cache = RenderCache()
+
+    first = render_many(regs, jobs=jobs, chunksize=2, bits=8, marker_namespace='c', cache=cache)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 5, 4)
+    second = render_many(regs[::-1], jobs=jobs, chunksize=2, bits=8, marker_namespace='c', cache=cache)
+
+    assert cache.hits == 4
+    assert [r.svg for r in second] == [r.svg for r in first][::-1]
+    assert first[2].error is not None and second[2].error is not None
+    assert first[0].svg == render_svg(regs[0], bits=8, marker_namespace='c')
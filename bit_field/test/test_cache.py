@@ -0,0 +1,140 @@
+import os
+import pickle
+import pytest
+from .. import cache as cache_module
+from .. import render_svg, compile_layout, RenderCache, DiskCache
+from ..cache import cache_key
+from ..render import Renderer
+
+
+REG = [
+    {"name": "ctrl", "bits": 8, "type": 2},
+    {"name": "data", "bits": 8, "attr": "RW"},
+]
+
+
+def test_cache_hit_returns_same_document():
+    cache = RenderCache(maxsize=4)
+
+    first = render_svg(REG, bits=8, cache=cache)
+    second = render_svg(REG, bits=8, cache=cache)
+
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_key_includes_default_options():
+    explicit = Renderer(bits=8, fontsize=14).options
+    implicit = Renderer(bits=8).options
+
+    assert cache_key(REG, explicit) == cache_key(REG, implicit)
+    assert cache_key(REG, implicit) != cache_key(REG, Renderer(bits=16).options)
+    assert cache_key(REG, implicit) != cache_key(REG[:1], implicit)
+
+
+def test_cache_key_tells_tuples_from_lists():
+    options = Renderer().options
+    as_tuples = [{"bits": 8, "attr": ("RO", "RW"), "type": (1, 2, 3)}]
+    as_lists = [{"bits": 8, "attr": ["RO", "RW"], "type": [1, 2, 3]}]
+    cache = RenderCache()
+
+    assert cache_key(as_tuples, options) != cache_key(as_lists, options)
+    assert render_svg(as_tuples, cache=cache, marker_namespace='t') == \
+        render_svg(as_tuples, marker_namespace='t')
+    assert render_svg(as_lists, cache=cache, marker_namespace='t') == \
+        render_svg(as_lists, marker_namespace='t')
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RenderCache(maxsize=2)
+    regs = [[{"name": name, "bits": 8}] for name in ("a", "b", "c")]
+
+    render_svg(regs[0], bits=8, cache=cache)
+    render_svg(regs[1], bits=8, cache=cache)
+    render_svg(regs[0], bits=8, cache=cache)
+    render_svg(regs[2], bits=8, cache=cache)
+
+    assert len(cache) == 2
+    render_svg(regs[0], bits=8, cache=cache)
+    render_svg(regs[1], bits=8, cache=cache)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_cache_accepts_layout_plans():
+    cache = RenderCache()
+    plan = compile_layout(REG, bits=8)
+
+    assert render_svg(plan, cache=cache) is render_svg(plan, cache=cache)
+    assert cache.hits == 1
+
+
+def test_cache_clear():
+    cache = RenderCache()
+    render_svg(REG, bits=8, cache=cache)
+    render_svg(REG, bits=8, cache=cache)
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_cache_requires_positive_size():
+    with pytest.raises(ValueError):
+        RenderCache(maxsize=0)
+
+
+def test_disk_cache_is_shared_between_instances(tmp_path):
+    first = render_svg(REG, bits=8, cache=DiskCache(tmp_path))
+
+    cache = DiskCache(tmp_path)
+    assert render_svg(REG, bits=8, cache=cache) == first
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert len(cache) == 1
+
+
+def test_disk_cache_key_includes_version(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path)
+    render_svg(REG, bits=8, cache=cache)
+
+    monkeypatch.setattr(cache_module, '__version__', '0.0.0')
+    render_svg(REG, bits=8, cache=cache)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    regs = [[{"name": name, "bits": 8}] for name in ("a", "b", "c")]
+    size = len(render_svg(regs[0], bits=8).encode('utf-8'))
+    cache = DiskCache(tmp_path, max_size=2 * size + 1)
+
+    render_svg(regs[0], bits=8, cache=cache)
+    render_svg(regs[1], bits=8, cache=cache)
+    path = cache._path(cache_key(regs[1], Renderer(bits=8).options))
+    os.utime(path, ns=(1, 1))
+    render_svg(regs[2], bits=8, cache=cache)
+
+    assert len(cache) == 2
+    assert not os.path.exists(path)
+    assert cache.size() <= cache.max_size
+
+
+def test_disk_cache_stats_and_clear(tmp_path):
+    cache = DiskCache(tmp_path)
+    render_svg(REG, bits=8, cache=cache)
+    render_svg(REG, bits=8, cache=cache)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert stats['size'] > 0
+
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_disk_cache_is_picklable(tmp_path):
+    cache = pickle.loads(pickle.dumps(DiskCache(tmp_path, max_size=1024)))
+
+    assert cache.max_size == 1024
+    assert render_svg(REG, bits=8, cache=cache).startswith('<svg')
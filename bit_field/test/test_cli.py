@@ -0,0 +1,132 @@
+import json
+import sys
+import pytest
+from .. import cli
+
+
+REG = [{"name": "field", "bits": 8}, {"bits": 8}]
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['bit_field', '--no-json5', *argv])
+    cli.bit_field_cli()
+
+
+def test_single_input_prints_svg(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'reg.json'
+    source.write_text(json.dumps(REG))
+
+    _run(monkeypatch, str(source), '--bits', '8')
+
+    assert capsys.readouterr().out.startswith('<svg')
+
+
+def test_config_payload_document(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'reg.json'
+    source.write_text(json.dumps({"config": {"bits": 16, "hspace": 400}, "payload": REG}))
+
+    _run(monkeypatch, str(source))
+
+    assert 'width="400"' in capsys.readouterr().out
+
+
+def test_batch_writes_svg_per_input(tmp_path, monkeypatch, capsys):
+    sources = tmp_path / 'regs'
+    (sources / 'sub').mkdir(parents=True)
+    (sources / 'a.json').write_text(json.dumps(REG))
+    (sources / 'sub' / 'b.json').write_text(json.dumps({"config": {"bits": 8}, "payload": REG}))
+    (sources / 'bad.json').write_text(json.dumps([{"bits": 8}, {"label_lines": "x"}]))
+    out = tmp_path / 'out'
+
+    with pytest.raises(SystemExit) as exit_info:
+        _run(monkeypatch, str(sources), '--output-dir', str(out), '--jobs', '2')
+
+    assert exit_info.value.code == 1
+    assert (out / 'a.svg').read_text().startswith('<svg')
+    assert (out / 'sub' / 'b.svg').read_text().startswith('<svg')
+    assert not (out / 'bad.svg').exists()
+    summary = capsys.readouterr().err
+    assert 'rendered 2 of 3 files' in summary
+    assert 'FAILED' in summary and 'bad.json' in summary
+
+
+def test_batch_rejects_colliding_output_names(tmp_path, monkeypatch, capsys):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'x.json').write_text(json.dumps(REG))
+    out = tmp_path / 'out'
+
+    with pytest.raises(SystemExit) as exit_info:
+        _run(monkeypatch, str(tmp_path / 'a' / 'x.json'), str(tmp_path / 'b' / 'x.json'),
+             '--output-dir', str(out))
+
+    assert exit_info.value.code == 2
+    assert 'x.svg <- ' in capsys.readouterr().err
+    assert not out.exists()
+
+
+def test_batch_glob_writes_next_to_inputs(tmp_path, monkeypatch):
+    for name in ('x', 'y'):
+        (tmp_path / (name + '.json')).write_text(json.dumps(REG))
+
+    with pytest.raises(SystemExit) as exit_info:
+        _run(monkeypatch, str(tmp_path / '*.json'), '--bits', '8')
+
+    assert exit_info.value.code == 0
+    assert (tmp_path / 'x.svg').exists()
+    assert (tmp_path / 'y.svg').exists()
+
+
+def test_cache_dir_serves_unchanged_inputs(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv('BITFIELD_CACHE_DIR', raising=False)
+    for name in ('x', 'y'):
+        (tmp_path / (name + '.json')).write_text(json.dumps([{"name": name, "bits": 8}]))
+    cache_dir = tmp_path / 'cache'
+    argv = (str(tmp_path / '*.json'), '--output-dir', str(tmp_path / 'out'),
+            '--cache-dir', str(cache_dir), '--cache-stats')
+
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, *argv)
+    first = (tmp_path / 'out' / 'x.svg').read_text()
+    assert '0 hits, 2 misses' in capsys.readouterr().err
+
+    (tmp_path / 'out' / 'x.svg').unlink()
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, *argv)
+    assert (tmp_path / 'out' / 'x.svg').read_text() == first
+    report = capsys.readouterr().err
+    assert 'rendered 2 of 2 files' in report
+    assert '2 hits, 0 misses' in report and '2 entries' in report
+
+
+def test_cache_dir_from_environment(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'reg.json'
+    source.write_text(json.dumps(REG))
+    monkeypatch.setenv('BITFIELD_CACHE_DIR', str(tmp_path / 'cache'))
+
+    _run(monkeypatch, str(source), '--bits', '8')
+    _run(monkeypatch, str(source), '--bits', '8', '--cache-stats')
+
+    out, err = capsys.readouterr()
+    assert out.count('<svg') == 2
+    assert '1 hits, 0 misses' in err
+
+
+def test_server_option_falls_back_to_local_rendering(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'reg.json'
+    source.write_text(json.dumps(REG))
+
+    _run(monkeypatch, str(source), '--bits', '8', '--server', 'unix:' + str(tmp_path / 'none.sock'))
+
+    assert capsys.readouterr().out.startswith('<svg')
+
+
+def test_beautify_indents_output(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'reg.json'
+    source.write_text(json.dumps(REG))
+
+    _run(monkeypatch, str(source), '--bits', '8', '--beautify', '--indent', '4')
+
+    lines = capsys.readouterr().out.split('\n')
+    assert lines[0].startswith('<svg')
+    assert lines[1].startswith('    <defs')
@@ -0,0 +1,26 @@
+import importlib
+import os
+import stat
+import sys
+import pytest
+from .. import fsutil
+from ..fsutil import atomic_write
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='POSIX permissions')
+def test_atomic_write_follows_umask(tmp_path):
+    old = os.umask(0o027)
+    try:
+        atomic_write(tmp_path / 'a' / 'x.svg', '<svg/>')
+    finally:
+        os.umask(old)
+
+    target = tmp_path / 'a' / 'x.svg'
+    assert target.read_text() == '<svg/>'
+    assert stat.S_IMODE(target.stat().st_mode) == 0o640
+    assert os.listdir(tmp_path / 'a') == ['x.svg']
+
+
+def test_importing_does_not_touch_umask(monkeypatch):
+    monkeypatch.setattr(os, 'umask', lambda mask: pytest.fail('umask changed'))
+    importlib.reload(fsutil)
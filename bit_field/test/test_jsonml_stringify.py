@@ -0,0 +1,78 @@
+from .. import render
+from ..jsonml_stringify import Markup, jsonml_stringify
+
+
+def test_stringify_elements():
+    tree = ['svg', {'width': 10, 'height': 2.5},
+            ['g', {}],
+            None,
+            ['text', {'x': 1}, 'abc'],
+            ['text', {'x': 2}, '']]
+
+    assert jsonml_stringify(tree) == (
+        '<svg width="10" height="2.5"><g /><text x="1">abc</text><text x="2"/></svg>'
+    )
+    assert jsonml_stringify(['g', {}, None]) == '<g />'
+    assert jsonml_stringify(None) == ''
+
+
+def test_stringify_escapes_text_and_attributes():
+    tree = ['text', {'data-name': 'a "b" & <c>'}, 'x < y & z > w']
+
+    assert jsonml_stringify(tree) == (
+        '<text data-name="a &quot;b&quot; &amp; &lt;c&gt;">x &lt; y &amp; z &gt; w</text>'
+    )
+
+
+def test_stringify_handles_deep_trees():
+    depth = 5000
+    tree = ['g', {}]
+    node = tree
+    for _ in range(depth):
+        child = ['g', {}]
+        node.append(child)
+        node = child
+
+    svg = jsonml_stringify(tree)
+
+    assert svg.count('<g >') == depth
+    assert svg.endswith('<g />' + '</g>' * depth)
+
+
+def test_stringify_indent():
+    tree = ['svg', {'width': 10},
+            ['g', {},
+             ['line', {'x1': 0}],
+             None,
+             ['text', {'x': 1}, ['tspan', {}, 'a'], ['tspan', {'font-weight': 'bold'}, 'b']]],
+            ['g', {}, None],
+            ['style', {}, 'x{}']]
+
+    assert jsonml_stringify(tree, indent=2) == '\n'.join([
+        '<svg width="10">',
+        '  <g >',
+        '    <line x1="0"/>',
+        '    <text x="1"><tspan >a</tspan><tspan font-weight="bold">b</tspan></text>',
+        '  </g>',
+        '  <g />',
+        '  <style >x{}</style>',
+        '</svg>',
+    ])
+    assert jsonml_stringify(tree, indent='\t').split('\n')[2] == '\t\t<line x1="0"/>'
+
+
+def test_stringify_indent_keeps_markup():
+    tree = render([{"name": "a <b>b</b>", "bits": 4}, {"array": 4, "name": "x"}], bits=8,
+                  marker_namespace='pretty')
+    pretty = jsonml_stringify(tree, indent=1)
+
+    assert len(pretty.split('\n')) > 10
+    assert ''.join(line.strip() for line in pretty.split('\n')) == jsonml_stringify(tree)
+
+
+def test_stringify_emits_markup_verbatim():
+    fragment = Markup('<line x1="0"/>')
+    tree = ['g', {}, fragment, 'a<b', ['g', {}, fragment]]
+
+    assert jsonml_stringify(tree) == '<g ><line x1="0"/>a&lt;b<g ><line x1="0"/></g></g>'
+    assert jsonml_stringify(tree, indent=1).split('\n')[1] == ' <line x1="0"/>'
@@ -253,7 +253,8 @@ def test_arrow_jump_draws_path_left():
         "end_bit": 5,
     }
     renderer = Renderer(bits=8, arrow_jumps=cfg)
-    res = renderer.render(reg)
+    plan = renderer.compile(reg)
+    res = renderer.render(plan)
 
     path_node = _find_path(
         res,
@@ -265,11 +266,11 @@ def test_arrow_jump_draws_path_left():
 
     step = renderer.hspace / renderer.mod
     base_y = renderer.fontsize * 1.2
-    line_center = lambda line: base_y + renderer.vlane * line + renderer.attr_padding * line + renderer.vlane / 2
+    line_center = lambda line: base_y + plan.vlane * line + plan.attr_padding * line + plan.vlane / 2
     bit_x = lambda bit: step * (renderer.mod - bit - 0.5)
-    outer_distance = renderer.arrow_jumps[0]["_outer_distance"]
+    outer_distance = plan.arrow_jumps[0]["_outer_distance"]
     assert outer_distance == pytest.approx(10)
-    assert renderer.arrow_jumps[0]["_offset"] == 0
+    assert plan.arrow_jumps[0]["_offset"] == 0
     outer_x = -outer_distance
 
     arrow_head = renderer._arrow_jump_head_extent(float(attrs["stroke-width"]))
@@ -335,9 +336,10 @@ def test_arrow_jump_leftmost_end_bit_extends_margin_for_direction():
         "end_bit": 0,
     }
     renderer = Renderer(bits=32, arrow_jumps=cfg, vflip=True)
-    res = renderer.render(reg)
+    plan = renderer.compile(reg)
+    res = renderer.render(plan)
 
-    arrow_cfg = renderer.arrow_jumps[0]
+    arrow_cfg = plan.arrow_jumps[0]
     assert arrow_cfg["_outer_distance"] == pytest.approx(23)
 
     path_node = _find_path(
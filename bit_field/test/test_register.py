@@ -0,0 +1,80 @@
+import pytest
+
+from .. import Register, render_svg
+
+
+def _reg():
+    return ([{"name": "f{}".format(i), "bits": 8, "attr": "RW"} for i in range(30)]
+            + [{"array": 24, "name": "gap", "type": 3}]
+            + [{"name": "tail", "bits": 16},
+               {"label_lines": "L", "font_size": 6, "start_line": 2, "end_line": 4, "layout": "left"},
+               {"arrow_jump": 3, "start_line": 6, "jump_to_first": 6, "jump_to_second": 8,
+                "end_bit": 3, "layout": "right"}])
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'compact': True, 'hflip': True},
+    {'uneven': True, 'vflip': True},
+    {'css_classes': True, 'precision': 1, 'coalesce_paths': True},
+    {'fold_lanes': True, 'legend': {'gap': 3}},
+    {'lane_range': (1, 6)},
+])
+def test_incremental_render_matches_full_render(options):
+    options = dict(options, bits=16, marker_namespace='reg')
+    register = Register(_reg(), **options)
+    assert register.render_svg() == render_svg(_reg(), **options)
+
+    edits = [
+        lambda: register.rename(3, 'renamed'),
+        lambda: register.retype(7, 2),
+        lambda: register.resize(20, 4),
+        lambda: register.insert(12, {"name": "new", "bits": 12}),
+        lambda: register.resize(31, 40),
+        lambda: register.rename(5, None),
+        lambda: register.insert(0, {"name": "wide", "bits": 8, "attr": ["A", "B"]}),
+        # entries past the last field dirty no lane
+        lambda: register.insert(len(register.desc), {
+            "arrow_jump": 5, "start_line": 1, "jump_to_first": 1, "jump_to_second": 3,
+            "end_bit": 5, "layout": "left"}),
+        lambda: register.insert(len(register.desc) - 3, {
+            "label_lines": "M", "font_size": 6, "start_line": 1, "end_line": 5, "layout": "right"}),
+    ]
+    for edit in edits:
+        edit()
+        assert register.render_svg() == render_svg(register.desc, **options)
+
+
+def test_edits_only_redraw_their_lanes():
+    register = Register(_reg(), bits=16)
+    register.render_svg()
+
+    register.rename(3, 'renamed')
+    assert register.dirty_lanes == {1}
+    register.render_svg()
+    # row 16 is lane 1; the label and arrow rows are not touched
+    assert register.redrawn == (('lane', 16),)
+
+    register.retype(30, 5)
+    assert register.dirty_lanes == {15, 16}
+    register.render_svg()
+    assert set(register.redrawn) == {('gaps',), ('lane', 1), ('lane', 2), ('label', 0)}
+
+    register.resize(26, 16)
+    assert register.dirty_lanes == set(range(13, 18))
+    register.render_svg()
+    assert set(register.redrawn) == {('gaps',), ('label', 0)} | {('lane', line) for line in range(5)}
+    assert register.dirty_lanes == set()
+
+
+def test_register_keeps_its_own_copy():
+    desc = _reg()
+    register = Register(desc)
+    register.rename(0, 'x')
+
+    assert desc[0]['name'] == 'f0'
+    assert register.desc[0]['name'] == 'x'
+    with pytest.raises(ValueError):
+        register.rename(32, 'label')
+    with pytest.raises(ValueError):
+        Register(desc, use_symbols=True)
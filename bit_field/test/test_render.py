@@ -1,12 +1,17 @@
+import copy
+import dataclasses
+import io
 import math
+import re
 import pytest
 import json
-from .. import render
+from concurrent.futures import ThreadPoolExecutor
+from .. import compile_layout, iter_svg, marker_defs, render, render_to, LayoutPlan
 from ..jsonml_stringify import jsonml_stringify
 from pathlib import Path
 from subprocess import run, CalledProcessError
 from .render_report import render_report
-from ..render import Renderer
+from ..render import Renderer, _CAGE_CACHE, _number_formatter
 
 
 @pytest.mark.parametrize('bits', [31, 16, 8])
@@ -219,7 +224,8 @@ def _collect_attr_text_nodes(node, collected):
 def test_rotated_attr_reserves_space_and_rotates_text():
     desc = [{"name": "Rotate", "bits": 8, "attr": ["Vertical", -90]}]
     renderer = Renderer(bits=8)
-    jsonml = renderer.render(desc)
+    plan = renderer.compile(desc)
+    jsonml = renderer.render(plan)
 
     attr_nodes = []
     _collect_attr_text_nodes(jsonml, attr_nodes)
@@ -232,7 +238,7 @@ def test_rotated_attr_reserves_space_and_rotates_text():
     assert attrs.get('dominant-baseline') == 'middle'
     assert attrs.get('transform', '').startswith('rotate(-90')
 
-    total_attr_height = renderer.attr_padding
+    total_attr_height = plan.attr_padding
     char_width = renderer.trim_char_width if renderer.trim_char_width is not None else renderer.fontsize * 0.6
     text_width = len('Vertical') * char_width
     expected_height = max(abs(text_width * math.sin(math.radians(-90))) + abs(renderer.fontsize * math.cos(math.radians(-90))), renderer.fontsize)
@@ -275,3 +281,605 @@ def test_number_draw_disabled_removes_label_offset():
 
     assert label_offsets, 'expected bit-number offsets when number_draw is enabled'
     assert label_offsets.isdisjoint(transforms_without)
+
+
+def test_fields_are_bucketed_by_lane():
+    reg = [
+        {"name": "low", "bits": 4},
+        {"name": "wide", "bits": 20},
+        {"name": "high", "bits": 8},
+    ]
+    plan = Renderer(bits=8).compile(reg)
+
+    names = [[e['name'] for e in bucket] for bucket in plan.lane_fields]
+    assert names == [['low', 'wide'], ['wide'], ['wide'], ['high']]
+
+
+def _strip_marker_ids(svg):
+    return re.sub(r'(arrow(?:-jump-head)?)-[0-9a-f]{8}', r'\1', svg)
+
+
+def test_render_does_not_modify_descriptor():
+    reg = [
+        {"name": "field", "bits": 8, "attr": "RO"},
+        {"array": 8, "hide_lines": True},
+        {"bits": 8},
+        {"label_lines": "Demo", "font_size": 6, "start_line": 0, "end_line": 1, "layout": "left"},
+        {"arrow_jump": 1, "start_line": 0, "jump_to_first": 1, "jump_to_second": 2,
+         "end_bit": 2, "layout": "right"},
+    ]
+    original = copy.deepcopy(reg)
+
+    render(reg, bits=8)
+
+    assert reg == original
+
+
+def test_compile_layout_plan_is_reusable():
+    reg = [
+        {"name": "a", "bits": 12, "type": 2},
+        {"name": "b", "bits": 12, "attr": ["0b101", "RW"]},
+    ]
+    plan = compile_layout(reg, bits=8)
+
+    assert isinstance(plan, LayoutPlan)
+    assert plan.lanes == 3
+    assert plan.entries[1]['lsb'] == 12
+    assert 'lsb' not in reg[1]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plan.lanes = 4
+    with pytest.raises(TypeError):
+        plan.entries[0]['lsb'] = 1
+
+    expected = _strip_marker_ids(jsonml_stringify(render(reg, bits=8)))
+    assert _strip_marker_ids(jsonml_stringify(render(plan))) == expected
+    assert _strip_marker_ids(jsonml_stringify(render(plan))) == expected
+
+
+def test_render_plan_rejects_other_options():
+    plan = compile_layout([{"bits": 8}], bits=8)
+
+    with pytest.raises(TypeError):
+        render(plan, bits=16)
+    with pytest.raises(ValueError):
+        Renderer(bits=16).render(plan)
+
+
+def test_deterministic_marker_ids_are_stable():
+    reg = [{"name": "field", "bits": 8}]
+
+    first = jsonml_stringify(render(reg, bits=8, deterministic_ids=True))
+    second = jsonml_stringify(render(reg, bits=8, deterministic_ids=True))
+    other = jsonml_stringify(render([{"name": "other", "bits": 8}], bits=8, deterministic_ids=True))
+
+    assert first == second
+    marker_id = re.search(r'id="(arrow-[0-9a-f]{8})"', first).group(1)
+    assert 'id="{}"'.format(marker_id) not in other
+
+
+def test_marker_namespace_sets_marker_ids():
+    reg = [{"name": "field", "bits": 8}]
+
+    svg = jsonml_stringify(render(reg, bits=8, marker_namespace='reg-a'))
+
+    assert 'id="arrow-reg-a"' in svg
+    assert 'id="arrow-jump-head-reg-a"' in svg
+    with pytest.raises(ValueError):
+        render(reg, bits=8, marker_namespace='bad id')
+
+
+def test_shared_markers_omit_defs():
+    reg = [{"bits": 8}, {"bits": 8}]
+    label = {"label_lines": "L", "font_size": 6, "start_line": 0, "end_line": 1, "layout": "left"}
+    jsonml = render(reg, bits=8, label_lines=label, shared_markers=True)
+    svg = jsonml_stringify(jsonml)
+    sheet = jsonml_stringify(marker_defs())
+
+    assert '<defs' not in svg
+    assert 'url(#arrow-shared)' in svg
+    assert 'id="arrow-shared"' in sheet
+    assert 'id="arrow-jump-head-shared"' in sheet
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'compact': True, 'legend': {'Status': 2}},
+    {'hflip': True, 'vflip': True, 'uneven': True},
+    {'css_classes': True, 'legend': {'Status': 2}},
+    {'precision': 1, 'coalesce_paths': True},
+    {'use_symbols': True, 'css_classes': True},
+])
+def test_streamed_svg_matches_render(options):
+    reg = [
+        {"name": "head", "bits": 5, "attr": "RO"},
+        {"array": 12, "name": "gap", "type": 3},
+        {"name": "tail", "bits": 20},
+        {"label_lines": "L", "font_size": 6, "start_line": 0, "end_line": 2, "layout": "right"},
+    ]
+    options = dict(options, bits=8, marker_namespace='stream')
+    expected = jsonml_stringify(render(reg, **options))
+
+    chunks = list(iter_svg(reg, **options))
+    assert len(chunks) > 5
+    assert ''.join(chunks) == expected
+
+    text = io.StringIO()
+    render_to(reg, text, **options)
+    assert text.getvalue() == expected
+
+    data = io.BytesIO()
+    render_to(reg, data, **options)
+    assert data.getvalue() == expected.encode('utf-8')
+
+
+def test_css_classes_replace_font_and_fill_attributes():
+    reg = [
+        {"name": "a", "bits": 4, "type": 2, "attr": "RW"},
+        {"name": "b", "bits": 4, "type": [1, 2, 3]},
+        {"bits": 8},
+        {"label_lines": "L", "font_size": 9, "start_line": 0, "end_line": 1, "layout": "left"},
+    ]
+    options = dict(bits=8, legend={'A': 2}, fontfamily='mono', marker_namespace='css')
+    plain = jsonml_stringify(render(reg, **options))
+    svg = jsonml_stringify(render(reg, css_classes=True, **options))
+
+    assert 'font-family' in plain and 'rgb(1, 2, 3)' in plain
+    scope = re.search(r'<svg [^>]*class="(bf-[0-9a-f]{8})"', svg).group(1)
+    style = re.search(r'<style >(.*?)</style>', svg).group(1)
+    assert '.{} text{{font-family:mono;font-weight:normal}}'.format(scope) in style
+    assert '.{} .t0{{font-size:14px}}'.format(scope) in style
+    assert '.{} .t1{{font-size:9px}}'.format(scope) in style
+    assert 'fill:rgb(1, 2, 3)' in style
+    body = svg[svg.index('</style>'):]
+    assert 'font-size' not in body and 'font-family' not in body
+    assert 'rgb(' not in body.replace('stroke="rgb', '')
+    assert len(svg) < len(plain)
+
+
+def test_css_scope_depends_on_styles_only():
+    reg = [{"name": "a", "bits": 8, "type": 3}]
+    scope = re.compile(r'class="(bf-[0-9a-f]{8})"')
+
+    first = scope.search(jsonml_stringify(render(reg, bits=8, css_classes=True))).group(1)
+    renamed = [{"name": "b", "bits": 8, "type": 3}]
+    second = scope.search(jsonml_stringify(render(renamed, bits=8, css_classes=True))).group(1)
+    recolored = [{"name": "a", "bits": 8, "type": 4}]
+    third = scope.search(jsonml_stringify(render(recolored, bits=8, css_classes=True))).group(1)
+
+    assert first == second
+    assert first != third
+
+
+def _walk(node):
+    if isinstance(node, list):
+        yield node
+        for child in node[2:]:
+            yield from _walk(child)
+
+
+def _path_segments(d):
+    # resolve the M/m/h/v/l/z commands emitted by coalesce_paths
+    segments = []
+    x = y = start_x = start_y = 0
+    for command, args in re.findall(r'([MmhvlLz])([^MmhvlLz]*)', d):
+        values = [float(v) for v in args.split()]
+        if command in 'Mm':
+            if command == 'm':
+                values = [x + values[0], y + values[1]]
+            x, y = start_x, start_y = values
+            continue
+        if command == 'z':
+            end = (start_x, start_y)
+        elif command == 'h':
+            end = (x + values[0], y)
+        elif command == 'v':
+            end = (x, y + values[0])
+        else:
+            end = (x + values[0], y + values[1])
+        segments.append((round(x, 6), round(y, 6), round(end[0], 6), round(end[1], 6)))
+        x, y = end
+    return segments
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'compact': True},
+    {'hflip': True, 'vflip': True, 'uneven': True},
+])
+def test_coalesced_cage_paths_match_lines(options):
+    reg = [
+        {"name": "head", "bits": 5},
+        {"array": 12, "name": "gap", "type": 3, "hide_lines": True},
+        {"name": "tail", "bits": 20},
+    ]
+    options = dict(options, bits=8)
+    plain = render(reg, **options)
+    merged = render(reg, coalesce_paths=True, **options)
+
+    def cage_lines(root):
+        segments = []
+        for node in _walk(root):
+            if node[0] == 'g' and node[1].get('stroke') == 'black' and 'transform' in node[1]:
+                for child in node[2:]:
+                    if child[0] == 'line':
+                        a = child[1]
+                        segments.append(tuple(round(a.get(k, 0), 6) for k in ('x1', 'y1', 'x2', 'y2')))
+                    elif child[0] == 'path':
+                        segments.extend(_path_segments(child[1]['d']))
+        return segments
+
+    expected = cage_lines(plain)
+    assert expected
+    assert cage_lines(merged) == expected
+    merged_nodes = list(_walk(merged))
+    # cage lines inherit their stroke from the group; none are left
+    assert not any(node[0] == 'line' and 'stroke' not in node[1] for node in merged_nodes)
+    assert len(merged_nodes) < len(list(_walk(plain)))
+
+
+def test_coalesced_gap_fill_is_one_path():
+    reg = [{"bits": 4}, {"array": 20, "type": 4}, {"bits": 8}]
+    plain = render(reg, bits=8)
+    merged = render(reg, bits=8, coalesce_paths=True)
+
+    polygons = [n for n in _walk(plain) if n[0] == 'polygon' and n[1]['stroke'] == 'none']
+    paths = [n for n in _walk(merged) if n[0] == 'path' and n[1].get('stroke') == 'none']
+    assert len(polygons) == 3
+    assert len(paths) == 1
+    assert paths[0][1]['fill'] == polygons[0][1]['fill']
+    assert paths[0][1]['d'].count('z') == 3
+    segments = _path_segments(paths[0][1]['d'])
+    drawn = [sorted({point for seg in segments[i:i + 4] for point in (seg[:2], seg[2:])})
+             for i in range(0, len(segments), 4)]
+    expected = [sorted(tuple(round(float(v), 6) for v in point.split(','))
+                       for point in polygon[1]['points'].split())
+                for polygon in polygons]
+    assert drawn == expected
+
+
+def test_number_formatter_strips_zeros():
+    format_number = _number_formatter(2)
+    assert format_number(26.666666666666668) == '26.67'
+    assert format_number(0.5) == '.5'
+    assert format_number(-0.25) == '-.25'
+    assert format_number(3.0) == '3'
+    assert format_number(-0.001) == '0'
+    assert _number_formatter(0)(12.6) == '13'
+
+
+@pytest.mark.parametrize('precision', [0, 2])
+def test_precision_quantizes_coordinates(precision):
+    reg = [
+        {"name": "0.123456", "bits": 5, "attr": "RW", "rotate": 33.333333},
+        {"array": 7, "type": 3, "name": "gap"},
+        {"name": "tail", "bits": 21},
+    ]
+    options = dict(bits=8, hspace=700, marker_namespace='q', coalesce_paths=True)
+    svg = jsonml_stringify(render(reg, precision=precision, **options))
+    plain = jsonml_stringify(render(reg, **options))
+
+    assert '0.123456' in svg  # text content is not touched
+    attributes = ' '.join(re.findall(r'="([^"]*)"', svg))
+    decimals = [len(frac) for frac in re.findall(r'\.(\d+)', attributes)]
+    assert max(decimals, default=0) <= precision
+    assert not re.search(r'(?<![\d.])0\.\d', attributes)
+    assert len(svg) < len(plain)
+
+
+def test_precision_must_be_non_negative_integer():
+    with pytest.raises(ValueError):
+        Renderer(precision=-1)
+    with pytest.raises(ValueError):
+        Renderer(precision=1.5)
+
+
+def _reserved_window():
+    # a 4096-bit window with fields in the first and last lanes only
+    return ([{"name": "ctrl", "bits": 8, "attr": "RW"}, {"bits": 24}]
+            + [{"bits": 32}] * 126
+            + [{"name": "status", "bits": 16, "type": 2}, {"bits": 16}])
+
+
+@pytest.mark.parametrize('options, elided', [
+    ({}, '… bits 32–4031 …'),
+    ({'compact': True}, '… bits 32–4031 …'),
+    ({'hflip': True, 'vflip': True}, '… bits 64–4063 …'),
+])
+def test_fold_lanes_elides_identical_lanes(options, elided):
+    reg = _reserved_window()
+    options = dict(options, marker_namespace='fold')
+    plain = render(reg, **options)
+    folded = render(reg, fold_lanes=True, **options)
+
+    markers = [node for node in _walk(folded) if node[1].get('class') == 'lane-fold']
+    assert len(markers) == 1
+    assert markers[0][2][2] == elided
+    assert folded[1]['height'] < plain[1]['height']
+    assert len(jsonml_stringify(folded)) < len(jsonml_stringify(plain)) / 10
+
+    plan = compile_layout(reg, fold_lanes=True, **options)
+    assert plan.folds == ((2, 126),)
+    assert plan.row_map[:3] == (0, 1, 2) and plan.row_map[126:] == (2, 3)
+
+
+def test_fold_lanes_is_off_by_default():
+    reg = _reserved_window()
+    plan = compile_layout(reg)
+
+    assert plan.folds == () and plan.row_map is None
+    assert 'lane-fold' not in jsonml_stringify(render(reg))
+
+
+def test_fold_lanes_keeps_referenced_rows():
+    reg = _reserved_window() + [
+        {"label_lines": "L", "font_size": 6, "start_line": 40, "end_line": 90, "layout": "left"},
+        {"arrow_jump": 3, "start_line": 60, "jump_to_first": 60, "jump_to_second": 127,
+         "end_bit": 3, "layout": "right"},
+    ]
+    renderer = Renderer(fold_lanes=True, marker_namespace='fold')
+    plan = renderer.compile(reg)
+    res = renderer.render(plan)
+
+    assert plan.folds == ((2, 39), (42, 59), (62, 89), (92, 126))
+    rows = plan.row_map
+    assert [rows[line] for line in (40, 60, 90, 127)] == [3, 6, 9, 12]
+    base_y = renderer.bit_label_height
+    top_y = base_y + (plan.vlane + plan.attr_padding) * rows[40]
+    bottom_y = base_y + (plan.vlane + plan.attr_padding) * (rows[90] + 1)
+    bracket = [node for node in _walk(res) if node[0] == 'line' and node[1].get('marker-start')]
+    assert (bracket[0][1]['y1'], bracket[0][1]['y2']) == (top_y, bottom_y)
+    arrow = [node for node in _walk(res) if node[0] == 'path' and 'marker-end' in node[1]]
+    assert arrow[0][1]['d'].endswith(',{}'.format(renderer._context(plan)._line_center_y(127, base_y)))
+
+
+def test_fold_lanes_skips_lanes_crossed_by_gaps():
+    reg = ([{"bits": 32}] * 20 + [{"array": 320, "name": "gap"}] + [{"bits": 32}] * 20)
+    plan = compile_layout(reg, fold_lanes=True)
+
+    assert plan.lanes == 50
+    for first, last in plan.folds:
+        assert not any(20 <= lane <= 29 for lane in range(first, last + 1))
+        assert not any(20 <= plan.lanes - row - 1 <= 29 for row in range(first, last + 1))
+    assert plan.folds
+
+
+def _lanes_of(res):
+    return [node for node in res[-1][2:] if node[0] == 'g' and not node[1].get('class')
+            and node[1].get('transform', '').startswith('translate(0')]
+
+
+def test_lane_range_draws_only_the_window():
+    reg = [{"name": "f{}".format(i), "bits": 8} for i in range(8)]
+    full = render(reg, bits=8, marker_namespace='w')
+    window = render(reg, bits=8, marker_namespace='w', lane_range=(2, 4))
+
+    full_lanes = _lanes_of(full)
+    window_lanes = _lanes_of(window)
+    assert len(window_lanes) == 3
+    # lanes keep their bit numbers and fields, only their position changes
+    assert [lane[2:] for lane in window_lanes] == [lane[2:] for lane in full_lanes[2:5]]
+    assert window_lanes[0][1] == full_lanes[0][1]
+    svg = jsonml_stringify(window)
+    assert '>f5<' in svg and '>f3<' in svg and '>f6<' not in svg and '>f2<' not in svg
+    assert window[1]['height'] == render([{"bits": 24}], bits=8)[1]['height']
+
+
+def test_lane_range_cuts_gaps_labels_and_arrows_at_the_edge():
+    reg = [
+        {"name": "head", "bits": 8},
+        {"array": 40, "name": "gap", "type": 3},
+        {"name": "tail", "bits": 16},
+        {"label_lines": "L", "font_size": 6, "start_line": 0, "end_line": 3, "layout": "left"},
+        {"arrow_jump": 3, "start_line": 0, "jump_to_first": 0, "jump_to_second": 7,
+         "end_bit": 3, "layout": "right"},
+    ]
+    renderer = Renderer(bits=8, hflip=True, marker_namespace='w', lane_range=(2, 5))
+    plan = renderer.compile(reg)
+    res = renderer.render(plan)
+
+    clips = [node for node in _walk(res) if node[0] == 'svg' and node is not res]
+    assert len(clips) == 1
+    top = renderer.bit_label_height
+    assert clips[0][1]['y'] == top
+    assert clips[0][1]['height'] == 4 * (plan.vlane + plan.attr_padding)
+    bracket = [node for node in _walk(res) if node[0] == 'line' and node[1].get('marker-start')]
+    assert bracket[0][1]['y1'] == top
+    assert bracket[0][1]['y2'] == top + 2 * (plan.vlane + plan.attr_padding)
+    assert not [node for node in _walk(res) if node[1].get('class') == 'arrow-jumps']
+
+
+def test_gaps_past_the_last_lane_are_kept_without_lane_range():
+    reg = [{"bits": 8}, {"array": 40, "name": "gap"}, {"bits": 8}]
+    res = render(reg, bits=8, lanes=2)
+
+    assert not [node for node in _walk(res) if node[0] == 'svg' and node is not res]
+    assert [node for node in _walk(res) if node[0] == 'polygon']
+
+
+def test_lane_range_margins_only_fit_drawn_labels():
+    reg = [{"bits": 64},
+           {"label_lines": "a long label", "font_size": 12, "start_line": 0, "end_line": 0,
+            "layout": "left"},
+           {"arrow_jump": 3, "start_line": 0, "jump_to_first": 0, "jump_to_second": 1,
+            "end_bit": 3, "layout": "right"}]
+
+    assert render(reg, lane_range=(1, 1))[1]['width'] == 640
+    assert render(reg, lane_range=(0, 1))[1]['width'] > 640
+
+
+def test_lane_range_starting_inside_a_fold_draws_its_marker():
+    reg = _reserved_window()
+    res = render(reg, fold_lanes=True, lane_range=(50, 127), marker_namespace='w')
+
+    # the array gaps group comes first
+    assert res[-1][3][1]['class'] == 'lane-fold'
+    assert len(_lanes_of(res)) == 1
+
+
+def test_lane_range_is_validated():
+    for lane_range in [(3, 2), (-1, 2), (1,), (0.5, 2), 'ab']:
+        with pytest.raises(ValueError):
+            Renderer(lane_range=lane_range)
+    with pytest.raises(ValueError):
+        render([{"bits": 64}], lane_range=(1, 2))
+
+
+def test_page_ranges_fit_max_height():
+    reg = [{"bits": 32}] * 10
+    renderer = Renderer()
+    max_height = render([{"bits": 96}])[1]['height']
+
+    assert renderer.page_ranges(reg, max_height) == [(0, 2), (3, 5), (6, 8), (9, 9)]
+    assert Renderer(fold_lanes=True).page_ranges(_reserved_window(), max_height) == [(0, 1), (2, 127)]
+    with pytest.raises(ValueError):
+        renderer.page_ranges(reg, 10)
+
+
+def _inline_symbols(node, symbols):
+    if not isinstance(node, list):
+        return node
+    if node[0] == 'use':
+        return symbols[node[1]['xlink:href'][1:]]
+    children = [child for child in node[2:]
+                if not (isinstance(child, list) and child[0] == 'defs'
+                        and all(c[0] == 'symbol' for c in child[2:]))]
+    return node[:2] + [_inline_symbols(child, symbols) for child in children]
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'compact': True, 'fold_lanes': True},
+    {'hflip': True, 'vflip': True, 'uneven': True},
+    {'precision': 1, 'coalesce_paths': True, 'css_classes': True},
+])
+def test_symbols_reference_identical_lanes(options):
+    reg = ([{"name": "f", "bits": 1}] * 64
+           + [{"array": 20, "type": 3, "hide_lines": True}]
+           + [{"name": "g", "bits": 2, "type": 2}] * 30
+           + [{"bits": 16}] * 40)
+    options = dict(options, bits=16, marker_namespace='sym')
+    plain = render(reg, **options)
+    res = render(reg, use_symbols=True, **options)
+
+    symbols = {node[1]['id']: node[2] for node in _walk(res) if node[0] == 'symbol'}
+    uses = [node for node in _walk(res) if node[0] == 'use']
+    assert len(symbols) < len(uses)
+    assert all(node[1]['overflow'] == 'visible' for node in _walk(res) if node[0] == 'symbol')
+    assert res[1].pop('xmlns:xlink') == 'http://www.w3.org/1999/xlink'
+    assert jsonml_stringify(_inline_symbols(res, symbols)) == jsonml_stringify(plain)
+
+
+def test_symbols_are_computed_once_per_distinct_lane(monkeypatch):
+    reg = [{"name": "f", "bits": 1}] * 32 * 20
+    calls = []
+    build = Renderer._cage
+    monkeypatch.setattr(Renderer, '_cage', lambda self, *args: calls.append(args) or build(self, *args))
+    Renderer(use_symbols=True).render(reg)
+
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'compact': True, 'fold_lanes': True},
+    {'hflip': True, 'vflip': True, 'uneven': True},
+    {'precision': 1, 'coalesce_paths': True, 'use_symbols': True},
+])
+def test_cage_cache_matches_render(options):
+    reg = ([{"name": "f", "bits": 3}] * 20
+           + [{"array": 20, "type": 3, "hide_lines": True}]
+           + [{"name": "g", "bits": 2, "type": 2}] * 30)
+    options = dict(options, bits=16, marker_namespace='cage')
+    expected = jsonml_stringify(render(reg, **options))
+
+    assert jsonml_stringify(render(reg, cage_cache=True, **options)) == expected
+    assert jsonml_stringify(render(reg, cage_cache=True, **options)) == expected
+
+
+def test_cage_cache_is_shared_between_renders(monkeypatch):
+    _CAGE_CACHE.clear()
+    render([{"name": "a", "bits": 1}] * 64, cage_cache=True)
+    assert _CAGE_CACHE.misses == 1 and _CAGE_CACHE.hits == 1
+
+    renderer = Renderer(cage_cache=True)
+    monkeypatch.setattr(renderer, '_cage', lambda *args: pytest.fail('cage was redrawn'))
+    renderer.render([{"name": "b", "bits": 1}] * 96)
+    assert _CAGE_CACHE.hits == 4
+
+
+def test_renderer_is_reusable():
+    small = [{"name": "a", "bits": 8}] * 2
+    large = [{"name": "b", "bits": 8, "type": 2}] * 6 + [{"array": 8, "hide_lines": True}]
+    renderer = Renderer(bits=16, marker_namespace='reuse')
+
+    first = jsonml_stringify(renderer.render(small))
+    second = jsonml_stringify(renderer.render(large))
+
+    plan = renderer.compile(large)
+    assert plan.lanes == 4 and plan.hidden_array_ranges == ((48, 56),)
+    assert jsonml_stringify(renderer.render(plan)) == second
+    assert first == jsonml_stringify(render(small, bits=16, marker_namespace='reuse'))
+    assert second == jsonml_stringify(render(large, bits=16, marker_namespace='reuse'))
+    assert renderer.options['lanes'] is None
+    assert jsonml_stringify(renderer.render(small)) == first
+    # render state stays on the per-call context
+    with pytest.raises(AttributeError):
+        renderer.lanes
+
+
+def test_renderer_serves_concurrent_renders():
+    regs = [[{"name": str(i), "bits": 1 + i % 7, "type": i % 5}] * (i + 1) for i in range(40)]
+    regs = [reg + [{"label_lines": "L", "font_size": 6, "start_line": 0, "end_line": 0,
+                    "layout": "left"}] for reg in regs]
+    renderer = Renderer(bits=8, css_classes=True, use_symbols=True, marker_namespace='mt')
+    expected = [jsonml_stringify(render(reg, bits=8, css_classes=True, use_symbols=True,
+                                        marker_namespace='mt')) for reg in regs]
+
+    with ThreadPoolExecutor(8) as pool:
+        rendered = list(pool.map(lambda reg: ''.join(renderer.iter_svg(reg)), regs * 4))
+
+    assert rendered == expected * 4
+
+
+def test_renderer_options_are_frozen_and_hashable():
+    legend = {"Status": 2}
+    renderer = Renderer(bits=8, legend=legend, types={"2": "#ff0000"})
+    legend["Other"] = 3
+
+    assert renderer.options['legend'] == {"Status": 2}
+    assert renderer.options == Renderer(bits=8, legend={"Status": 2}, types={"2": "#ff0000"}).options
+    assert hash(renderer.options) == hash(Renderer(bits=8, legend={"Status": 2},
+                                                   types={"2": "#ff0000"}).options)
+    assert renderer.options != Renderer(bits=16).options
+    with pytest.raises(TypeError):
+        renderer.options['bits'] = 16
+    plan = renderer.compile([{"bits": 8}])
+    assert plan.options is renderer.options
+
+
+def test_renderer_options_are_deeply_read_only():
+    renderer = Renderer(legend={"Status": [10, 20, 30]}, types={"2": {"color": "#ff0000"}},
+                        label_lines={"label_lines": "L", "font_size": 6, "start_line": 0,
+                                     "end_line": 0, "layout": "left"})
+    key = renderer.options._key
+
+    for mutate in [lambda: renderer.options['legend'].update(Other=3),
+                   lambda: renderer.legend['Status'].append(40),
+                   lambda: renderer.options['types']['2'].pop('color'),
+                   lambda: renderer.options['label_lines'][0].__setitem__('start_line', 1),
+                   lambda: renderer.options['label_lines'].append({})]:
+        with pytest.raises(TypeError):
+            mutate()
+    assert renderer.options._key == key
+    same = Renderer(**renderer.options)
+    assert same.options == renderer.options
+    assert copy.deepcopy(dict(renderer.options)) == dict(renderer.options)
+    assert jsonml_stringify(same.render([{"bits": 32}])) != ''
+
+
+def test_rendered_jsonml_is_plain_data():
+    reg = [{"name": "a<b>b</b>", "bits": 5, "attr": "RO"}, {"name": "tail", "bits": 27}]
+    res = render(reg, marker_namespace='plain')
+
+    text = json.dumps(res)
+    assert json.loads(text) == copy.deepcopy(res)
@@ -0,0 +1,89 @@
+import http.client
+import threading
+import pytest
+from .. import render_svg
+from ..server import RenderClient, make_server
+
+
+REG = [{"name": "field", "bits": 8}, {"bits": 8}]
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def server(request, tmp_path):
+    if request.param == 'tcp':
+        address = ('127.0.0.1', 0)
+    else:
+        address = str(tmp_path / 'bit_field.sock')
+    srv = make_server(address, jobs=1, max_request_size=4096)
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    if request.param == 'tcp':
+        srv.url = 'http://127.0.0.1:{}'.format(srv.server_address[1])
+    else:
+        srv.url = 'unix:' + address
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_server_renders_like_render_svg(server):
+    client = RenderClient(server.url)
+    try:
+        svg = client.render(REG, bits=8, deterministic_ids=True)
+        again = client.render(REG, bits=8, deterministic_ids=True)
+    finally:
+        client.close()
+
+    assert svg == render_svg(REG, bits=8, deterministic_ids=True)
+    assert again == svg
+    assert server.cache.hits == 1
+
+
+def test_server_reports_render_errors(server):
+    client = RenderClient(server.url)
+    try:
+        with pytest.raises(ValueError, match='bits must be greater than 4'):
+            client.render(REG, bits=0)
+        # the connection stays usable after an error
+        assert client.render(REG, bits=8).startswith('<svg')
+    finally:
+        client.close()
+
+
+def test_server_rejects_large_requests(server):
+    client = RenderClient(server.url)
+    try:
+        with pytest.raises(ValueError, match='larger than 4096 bytes'):
+            client.render([{"name": "x" * 5000, "bits": 8}])
+        assert client.render(REG, bits=8).startswith('<svg')
+    finally:
+        client.close()
+
+
+def test_server_keeps_connections_alive():
+    srv = make_server(('127.0.0.1', 0), jobs=1)
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', srv.server_address[1])
+        for _ in range(3):
+            connection.request('POST', '/render', b'[{"bits": 8}]')
+            response = connection.getresponse()
+            assert response.status == 200
+            assert response.getheader('Content-Type') == 'image/svg+xml'
+            response.read()
+        sock = connection.sock
+        connection.request('GET', '/health')
+        assert connection.getresponse().read() == b'ok\n'
+        assert connection.sock is sock
+        connection.close()
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def test_client_raises_oserror_without_server(tmp_path):
+    client = RenderClient('unix:' + str(tmp_path / 'missing.sock'))
+
+    with pytest.raises(OSError):
+        client.render(REG)
@@ -0,0 +1,28 @@
+import pytest
+from ..tspan import tspan, spans
+
+
+def test_tspan_plain_text():
+    assert tspan('reserved') == [['tspan', {}, 'reserved']]
+    assert tspan('') == [['tspan', {}, '']]
+
+
+def test_tspan_markup():
+    assert tspan('a<b>b</b><sub>c</sub>') == [
+        ['tspan', {}, 'a'],
+        ['tspan', {'font-weight': 'bold'}, 'b'],
+        ['tspan', {'baseline-shift': 'sub', 'font-size': '.7em'}, 'c'],
+    ]
+    assert tspan('<B>x</B>') == [['tspan', {'font-weight': 'bold'}, 'x']]
+    assert tspan('<b></b>') == []
+    assert tspan('x</i>y') == [['tspan', {}, 'x'], ['tspan', {}, 'y']]
+
+
+def test_spans_are_memoized_and_read_only():
+    first = spans('<i>1</i>')
+
+    assert spans('<i>1</i>') is first
+    attrs, text = first[0]
+    assert (dict(attrs), text) == ({'font-style': 'italic'}, '1')
+    with pytest.raises(TypeError):
+        attrs['font-style'] = 'normal'
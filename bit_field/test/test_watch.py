@@ -0,0 +1,61 @@
+import io
+import json
+import os
+from ..watch import Watcher
+
+
+def _write(path, data, tick):
+    path.write_text(json.dumps(data))
+    # make the change visible even on filesystems with coarse timestamps
+    os.utime(path, ns=(tick * 10 ** 9, tick * 10 ** 9))
+
+
+def test_watcher_renders_only_changed_files(tmp_path):
+    _write(tmp_path / 'a.json', [{"name": "a", "bits": 8}], 1)
+    _write(tmp_path / 'b.json', [{"name": "b", "bits": 8}], 1)
+    watcher = Watcher(tmp_path, json, {'bits': 8, 'marker_namespace': 'w'}, log=io.StringIO())
+
+    assert watcher.scan() == [tmp_path / 'a.json', tmp_path / 'b.json']
+    assert (tmp_path / 'a.svg').read_text().startswith('<svg')
+    assert watcher.scan() == []
+
+    # touched but identical content is not re-rendered
+    _write(tmp_path / 'a.json', [{"name": "a", "bits": 8}], 2)
+    assert watcher.scan() == []
+
+    _write(tmp_path / 'b.json', [{"name": "b2", "bits": 8}], 3)
+    assert watcher.scan() == [tmp_path / 'b.json']
+    assert 'b2' in (tmp_path / 'b.svg').read_text()
+
+
+def test_watcher_config_types_invalidate_only_users(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+    config = tmp_path / 'config.json'
+    types = {"gray": {"color": "#D9D9D9", "label": "test"}, "blue": {"color": "#0000FF"}}
+    _write(config, {"config": {"bits": 8, "types": types}}, 1)
+    _write(src / 'uses_test.json', [{"name": "a", "bits": 8, "type": "test"}], 1)
+    _write(src / 'uses_blue.json', [{"name": "b", "bits": 8, "type": "blue"}], 1)
+    _write(src / 'plain.json', {"config": {"hspace": 400}, "payload": [{"name": "c", "bits": 8}]}, 1)
+    out = tmp_path / 'out'
+    watcher = Watcher(src, json, {}, config_path=config, output_dir=out, log=io.StringIO())
+
+    assert len(watcher.scan()) == 3
+    assert 'width="400"' in (out / 'plain.svg').read_text()
+
+    types["gray"]["color"] = "#EEEEEE"
+    _write(config, {"config": {"bits": 8, "types": types}}, 2)
+    assert watcher.scan() == [src / 'uses_test.json']
+    assert '#EEEEEE' in (out / 'uses_test.svg').read_text()
+
+    _write(config, {"config": {"bits": 16, "types": types}}, 3)
+    assert len(watcher.scan()) == 3
+
+
+def test_watcher_reports_bad_files(tmp_path):
+    (tmp_path / 'bad.json').write_text('[{')
+    log = io.StringIO()
+    watcher = Watcher(tmp_path, json, {}, log=log)
+
+    assert watcher.scan() == []
+    assert 'FAILED' in log.getvalue()
@@ -1,4 +1,6 @@
 import re
+from functools import lru_cache
+from types import MappingProxyType
 trans = {
     '<o>': {'add': {'text-decoration': 'overline'}},
     '</o>': {'del': {'text-decoration': 'overline'}},
@@ -18,6 +20,8 @@ trans = {
     '</tt>': {'del': {'font-family': 'monospace'}}
 }
 pattern = '|'.join(re.escape(k) for k in trans.keys())
+_tag_re = re.compile(pattern, flags=re.IGNORECASE | re.UNICODE)
+_plain = MappingProxyType({})
 
 
 def dump(state):
@@ -29,7 +33,17 @@ def dump(state):
     return att
 
 
-def tspan(str):
+@lru_cache(maxsize=2048)
+def spans(text):
+    """Split ``text`` into ``(attributes, text)`` pairs, one per styled run.
+
+    Results are memoized and read-only (tuples and mapping proxies), so
+    repeated labels such as "reserved", "0" and "1" are parsed once and the
+    returned spans can be shared freely.
+    """
+    if '<' not in text:
+        return ((_plain, text),)
+
     state = {
         'text-decoration': {},
         'font-weight': {},
@@ -40,26 +54,26 @@ def tspan(str):
     }
 
     res = []
-
-    while True:
-        m = re.search(pattern, str, flags=re.IGNORECASE | re.UNICODE)
-        if m is None:
-            res.append(['tspan', dump(state), str])
-            break
-        if m.start(0) > 0:
-            res.append(['tspan', dump(state), str[:m.start(0)]])
-        tag = m.group(0)
-        cmd = trans[tag]
+    pos = 0
+    for m in _tag_re.finditer(text):
+        if m.start() > pos:
+            res.append((MappingProxyType(dump(state)), text[pos:m.start()]))
+        cmd = trans[m.group(0).lower()]
         if 'add' in cmd:
             for k, v in cmd['add'].items():
                 state[k][v] = True
         if 'del' in cmd:
             for k, v in cmd['del'].items():
-                del state[k][v]
-        str = str[m.end(0):]
-        if len(str) == 0:
-            break
-    return res
+                state[k].pop(v, None)
+        pos = m.end()
+    if pos < len(text) or pos == 0:
+        res.append((MappingProxyType(dump(state)), text[pos:]))
+    return tuple(res)
+
+
+def tspan(str):
+    # fresh dicts: the returned JSONML must stay plain lists and dicts
+    return [['tspan', dict(attrs), text] for attrs, text in spans(str)]
 
 
 if __name__ == '__main__':
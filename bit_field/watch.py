@@ -0,0 +1,153 @@
+from .batch import config_options, split_document
+from .cache import cache_key
+from .fsutil import atomic_write
+from .render import render_svg, _type_aliases
+from pathlib import Path
+import sys
+import time
+
+INPUT_SUFFIXES = ('.json', '.json5')
+
+
+def _used_types(desc, options):
+    used = set()
+    for e in desc:
+        if isinstance(e, dict) and e.get('type') is not None and not isinstance(e['type'], list):
+            used.add(str(e['type']))
+    legend = options.get('legend')
+    if isinstance(legend, dict):
+        used.update(str(value) for value in legend.values() if not isinstance(value, list))
+    return used
+
+
+def content_hash(desc, options):
+    """Hash everything that affects the rendering of ``desc``.
+
+    Only the ``types`` entries the descriptor (or its legend) refers to are
+    included, so editing an unrelated type leaves the hash unchanged.
+    """
+    options = dict(options)
+    types = options.pop('types', None)
+    if isinstance(types, dict):
+        used = _used_types(desc, options)
+        types = {key: value for key, value in types.items()
+                 if used.intersection(_type_aliases(key, value))}
+    options['types'] = types
+    return cache_key(desc, options)
+
+
+class Watcher(object):
+    """Re-render the descriptors below ``directory`` whenever they change.
+
+    Files are polled by modification time and size; a changed file is only
+    re-rendered when its :func:`content_hash` differs, which also covers the
+    options of a shared ``config_path`` document. SVGs are written atomically
+    next to their input, or below ``output_dir``.
+    """
+
+    def __init__(self, directory, json, options, config_path=None, output_dir=None, log=None):
+        self.directory = Path(directory)
+        self.json = json
+        self.options = dict(options)
+        self.config_path = Path(config_path) if config_path is not None else None
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.log = log
+        self.shared = {}
+        self._config_stamp = None
+        self._stamps = {}
+        self._documents = {}
+        self._hashes = {}
+
+    def _write(self, message):
+        (self.log or sys.stderr).write(message + '\n')
+
+    @staticmethod
+    def _stamp(path):
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, path):
+        with open(path, 'r') as f:
+            return self.json.load(f)
+
+    def _target(self, path):
+        if self.output_dir is None:
+            return path.with_suffix('.svg')
+        return self.output_dir / path.relative_to(self.directory).with_suffix('.svg')
+
+    def _scan_config(self):
+        if self.config_path is None:
+            return False
+        stamp = self._stamp(self.config_path)
+        if stamp == self._config_stamp:
+            return False
+        self._config_stamp = stamp
+        self.shared = config_options(self._load(self.config_path))
+        return True
+
+    def _inputs(self):
+        config = self.config_path.resolve() if self.config_path is not None else None
+        return sorted(path for path in self.directory.rglob('*')
+                      if path.suffix in INPUT_SUFFIXES and path.is_file()
+                      and path.resolve() != config)
+
+    def scan(self):
+        """Check all inputs once; return the paths that were re-rendered."""
+        try:
+            config_changed = self._scan_config()
+        except Exception as exc:
+            self._write('FAILED {}: {}: {}'.format(self.config_path, type(exc).__name__, exc))
+            config_changed = False
+
+        seen = set()
+        rendered = []
+        for path in self._inputs():
+            try:
+                stamp = self._stamp(path)
+            except FileNotFoundError:
+                continue
+            seen.add(path)
+            if stamp != self._stamps.get(path):
+                self._stamps[path] = stamp
+                try:
+                    self._documents[path] = split_document(self._load(path))
+                except Exception as exc:
+                    self._documents.pop(path, None)
+                    self._hashes.pop(path, None)
+                    self._write('FAILED {}: {}: {}'.format(path, type(exc).__name__, exc))
+                    continue
+            elif not config_changed:
+                continue
+            if path not in self._documents:
+                continue
+            desc, overrides = self._documents[path]
+            options = dict(self.options, **self.shared)
+            options.update(overrides)
+            digest = content_hash(desc, options)
+            if digest == self._hashes.get(path):
+                continue
+            start = time.perf_counter()
+            try:
+                atomic_write(self._target(path), render_svg(desc, **options))
+            except Exception as exc:
+                self._hashes.pop(path, None)
+                self._write('FAILED {}: {}: {}'.format(path, type(exc).__name__, exc))
+                continue
+            self._hashes[path] = digest
+            rendered.append(path)
+            self._write('rendered {} ({:.3f}s)'.format(path, time.perf_counter() - start))
+
+        for path in set(self._stamps) - seen:
+            del self._stamps[path]
+            self._documents.pop(path, None)
+            self._hashes.pop(path, None)
+        return rendered
+
+    def run(self, interval=0.5):
+        """Scan every ``interval`` seconds until interrupted."""
+        try:
+            while True:
+                self.scan()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass